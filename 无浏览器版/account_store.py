@@ -0,0 +1,215 @@
+import time
+import atexit
+import threading
+from datetime import datetime
+from config_handler import load_config, save_config
+from log_config import setup_logger
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+FLUSH_DELAY = 2.0   # 修改后延迟写盘的秒数，期间的多次修改合并为一次写入
+
+DEFAULT_BASE_URL = "https://www.tsdm39.com/"
+WORK_COOL_DOWN_SECONDS = 6 * 3600   # 打工冷却时间
+DEFAULT_VALIDITY_TTL = 3600         # cookie 确认有效后多少秒内不再单独检查，可以用 validity_ttl 设置修改，0 表示不缓存
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_time(time_str, field):
+    """把配置文件中的时间字符串转换为时间戳，没有记录或格式错误时返回 0"""
+    if not time_str:
+        return 0.0
+    try:
+        return datetime.strptime(time_str, TIME_FORMAT).timestamp()
+    except ValueError:
+        logger.error(f"解析 {field} {time_str} 时出错，格式可能不正确")
+        return 0.0
+
+
+def parse_work_deadline(last_work_time_str):
+    """把 last_work_time 转换为打工冷却结束的时间戳，没有记录或格式错误时返回 0"""
+    last_work_time = parse_time(last_work_time_str, "last_work_time")
+    return last_work_time + WORK_COOL_DOWN_SECONDS if last_work_time else 0.0
+
+
+class AccountStore:
+    """
+    进程内唯一的账号仓库：配置文件只加载一次，按用户名建立索引，
+    修改只作用于内存并标记为脏，再由定时器合并写回配置文件。
+    打工冷却结束时间在 last_work_time 变化时解析一次并缓存为时间戳。
+    cookie 最近一次确认有效的时间记录在 last_valid_time 中，同样缓存为时间戳，
+    在有效期（validity_ttl）内可以跳过单独检查登录状态的请求。
+    """
+
+    def __init__(self, flush_delay=FLUSH_DELAY):
+        self.flush_delay = flush_delay
+        self._lock = threading.RLock()
+        self._config = None
+        self._index = {}
+        self._work_deadlines = {}   # 用户名 -> 打工冷却结束的时间戳
+        self._valid_times = {}      # 用户名 -> cookie 最近一次确认有效的时间戳
+        self._dirty = False
+        self._flush_timer = None
+
+    def _ensure_loaded(self):
+        if self._config is None:
+            self.load()
+
+    def load(self):
+        """从配置文件加载账号并重建索引，会丢弃尚未写盘的修改"""
+        with self._lock:
+            self._cancel_flush_timer()
+            config = load_config()
+            config.setdefault("accounts", [])
+            self._config = config
+            self._index = {account["username"]: account for account in config["accounts"]}
+            self._work_deadlines = {
+                username: parse_work_deadline(account.get("last_work_time", ""))
+                for username, account in self._index.items()
+            }
+            self._valid_times = {
+                username: parse_time(account.get("last_valid_time", ""), "last_valid_time")
+                for username, account in self._index.items()
+            }
+            self._dirty = False
+
+    def get(self, username):
+        with self._lock:
+            self._ensure_loaded()
+            return self._index.get(username)
+
+    def all_accounts(self):
+        """返回 用户名 -> 账号信息 的字典（账号信息为内存中的同一对象，只读使用）"""
+        with self._lock:
+            self._ensure_loaded()
+            return dict(self._index)
+
+    def work_deadline(self, username):
+        """返回账号打工冷却结束的时间戳，没有冷却时为 0"""
+        return self._work_deadlines.get(username, 0.0)
+
+    def is_recently_valid(self, username, ttl=None):
+        """账号的 cookie 是否在有效期内确认过有效，ttl 默认读取 validity_ttl 设置"""
+        if ttl is None:
+            ttl = self.get_setting("validity_ttl", DEFAULT_VALIDITY_TTL)
+        with self._lock:
+            account = self._index.get(username)
+            if ttl <= 0 or account is None or not account.get("is_valid", False):
+                return False
+            return time.time() - self._valid_times.get(username, 0.0) < ttl
+
+    def mark_valid(self, username):
+        """
+        记录账号的 cookie 刚刚确认有效，账号不存在时返回 False。
+        上次确认仍在有效期内时不更新，避免每次请求页面都标记为脏、重写配置文件。
+        """
+        if self.is_recently_valid(username):
+            return True
+        return self.update(username, is_valid=True, last_valid_time=datetime.now().strftime(TIME_FORMAT))
+
+    def invalidate(self, username):
+        """标记账号的 cookie 已失效并清除有效期缓存，账号不存在时返回 False"""
+        return self.update(username, is_valid=False, last_valid_time="")
+
+    def update(self, username, **fields):
+        """更新已有账号的字段，账号不存在时返回 False"""
+        with self._lock:
+            self._ensure_loaded()
+            account = self._index.get(username)
+            if account is None:
+                return False
+            self._apply(username, account, fields)
+            return True
+
+    def update_many(self, updates):
+        """批量更新多个账号的字段，updates 为 用户名 -> 字段字典，返回实际更新的账号数"""
+        count = 0
+        with self._lock:
+            self._ensure_loaded()
+            for username, fields in updates.items():
+                account = self._index.get(username)
+                if account is None:
+                    continue
+                self._apply(username, account, fields)
+                count += 1
+        return count
+
+    def upsert(self, username, **fields):
+        """更新账号字段，账号不存在时新建"""
+        with self._lock:
+            self._ensure_loaded()
+            account = self._index.get(username)
+            if account is None:
+                account = {
+                    "base_url": DEFAULT_BASE_URL,
+                    "username": username,
+                    "password": "",
+                    "last_sign_date": "",
+                    "last_work_time": "",
+                    "is_valid": True,
+                    "cookies": []
+                }
+                self._config["accounts"].append(account)
+                self._index[username] = account
+                self._work_deadlines[username] = 0.0
+                self._valid_times[username] = 0.0
+            self._apply(username, account, fields)
+            return account
+
+    def remove(self, username):
+        with self._lock:
+            self._ensure_loaded()
+            account = self._index.pop(username, None)
+            if account is None:
+                return False
+            self._config["accounts"].remove(account)
+            self._work_deadlines.pop(username, None)
+            self._valid_times.pop(username, None)
+            self._mark_dirty()
+            return True
+
+    def get_setting(self, key, default=None):
+        with self._lock:
+            self._ensure_loaded()
+            return self._config.get(key, default)
+
+    def set_setting(self, key, value):
+        with self._lock:
+            self._ensure_loaded()
+            self._config[key] = value
+            self._mark_dirty()
+
+    def flush(self):
+        """立即把未保存的修改写回配置文件"""
+        with self._lock:
+            self._cancel_flush_timer()
+            if not self._dirty:
+                return
+            save_config(self._config)
+            self._dirty = False
+
+    def _apply(self, username, account, fields):
+        account.update(fields)
+        if "last_work_time" in fields:
+            self._work_deadlines[username] = parse_work_deadline(fields["last_work_time"])
+        if "last_valid_time" in fields:
+            self._valid_times[username] = parse_time(fields["last_valid_time"], "last_valid_time")
+        self._mark_dirty()
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _cancel_flush_timer(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+
+# 进程内共享的账号仓库
+account_store = AccountStore()
+# 退出前写回尚未保存的修改
+atexit.register(account_store.flush)
@@ -0,0 +1,165 @@
+import math
+from datetime import datetime
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionButton
+from log_config import setup_logger
+from account_store import account_store
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+COLUMN_HEADERS = ["用户", "cookie状态", "签到情况", "打工冷却", "", "功", "能", ""]
+USER_COLUMN, COOKIE_COLUMN, SIGN_STATUS_COLUMN, COOL_DOWN_COLUMN = 0, 1, 2, 3
+SIGN_BUTTON_COLUMN, WORK_BUTTON_COLUMN, RE_LOGIN_BUTTON_COLUMN, DELETE_BUTTON_COLUMN = 4, 5, 6, 7
+BUTTON_TEXTS = {
+    SIGN_BUTTON_COLUMN: "签到",
+    WORK_BUTTON_COLUMN: "打工",
+    RE_LOGIN_BUTTON_COLUMN: "重登",
+    DELETE_BUTTON_COLUMN: "删除",
+}
+BUTTON_ENABLED_ROLE = Qt.UserRole  # 按钮列：按钮是否可用
+
+
+def format_work_cool_down(work_deadline, now_ts): # 根据冷却结束时间戳格式化剩余时间
+    remaining = work_deadline - now_ts
+    if remaining <= 0:
+        return "00:00:00"
+    total_seconds = math.ceil(remaining)
+    hours = total_seconds // 3600
+    minutes = (total_seconds % 3600) // 60
+    seconds = total_seconds % 60
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+class AccountTableModel(QAbstractTableModel):
+    """
+    账号表格模型：单元格内容在视图绘制可见行时按需计算，
+    单个账号状态变化时只通知该行刷新。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._accounts = {}
+        self._usernames = []
+        self._rows = {}             # 用户名 -> 行号
+        self.set_current_time(datetime.now())
+
+    def set_current_time(self, current_time):
+        """设置绘制时使用的当前时间，每秒由时钟更新一次"""
+        self.current_time = current_time
+        self.current_ts = current_time.timestamp()
+        self.current_date = current_time.strftime("%Y-%m-%d")
+
+    def set_accounts(self, accounts):
+        """设置账号字典，账号列表不变时只刷新内容，否则重建模型"""
+        usernames = list(accounts)
+        if usernames == self._usernames:
+            self._accounts = accounts
+            self.refresh_all()
+            return
+        self.beginResetModel()
+        self._accounts = accounts
+        self._usernames = usernames
+        self._rows = {username: row for row, username in enumerate(usernames)}
+        self.endResetModel()
+
+    def username_at(self, row):
+        return self._usernames[row]
+
+    def refresh_account(self, username):
+        """通知视图刷新单个账号所在的行"""
+        row = self._rows.get(username)
+        if row is not None:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMN_HEADERS) - 1))
+
+    def refresh_columns(self, first_column, last_column):
+        """通知视图刷新若干列，视图只会重新绘制可见的行"""
+        if self._usernames:
+            self.dataChanged.emit(self.index(0, first_column), self.index(len(self._usernames) - 1, last_column))
+
+    def refresh_rows(self, first_row, last_row, first_column, last_column):
+        """通知视图刷新指定的行列范围，用于只刷新当前可见的行"""
+        if 0 <= first_row <= last_row < len(self._usernames):
+            self.dataChanged.emit(self.index(first_row, first_column), self.index(last_row, last_column))
+
+    def refresh_all(self):
+        self.refresh_columns(0, len(COLUMN_HEADERS) - 1)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._usernames)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMN_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMN_HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        return Qt.ItemIsEnabled
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        username = self._usernames[index.row()]
+        account_info = self._accounts.get(username, {})
+        column = index.column()
+        is_valid = account_info.get("is_valid", False)
+
+        if role == Qt.DisplayRole:
+            if column == USER_COLUMN:
+                return username
+            if column == COOKIE_COLUMN:
+                return "有效" if is_valid else "过期"
+            if column == SIGN_STATUS_COLUMN:
+                return "今日已签到" if account_info.get("last_sign_date", "") == self.current_date else "未签到"
+            if column == COOL_DOWN_COLUMN:
+                return format_work_cool_down(account_store.work_deadline(username), self.current_ts)
+            return BUTTON_TEXTS.get(column)
+
+        if role == BUTTON_ENABLED_ROLE:
+            if column == SIGN_BUTTON_COLUMN:
+                return is_valid and not (0 <= self.current_time.hour < 1)
+            if column == WORK_BUTTON_COLUMN:
+                return is_valid
+            return column in BUTTON_TEXTS
+        return None
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """
+    在单元格中绘制按钮，代替每行创建 QPushButton 控件。
+    """
+    clicked = pyqtSignal(int, int)  # 行号, 列号
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pressed = None
+
+    def paint(self, painter, option, index):
+        button_option = QStyleOptionButton()
+        button_option.rect = option.rect.adjusted(2, 2, -2, -2)
+        button_option.text = index.data(Qt.DisplayRole) or ""
+        if index.data(BUTTON_ENABLED_ROLE):
+            button_option.state = QStyle.State_Enabled
+            if self._pressed == (index.row(), index.column()):
+                button_option.state |= QStyle.State_Sunken
+            else:
+                button_option.state |= QStyle.State_Raised
+        else:
+            button_option.state = QStyle.State_None
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button_option, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        position = (index.row(), index.column())
+        if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            if index.data(BUTTON_ENABLED_ROLE):
+                self._pressed = position
+                return True
+        elif event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            pressed, self._pressed = self._pressed, None
+            if pressed == position and option.rect.contains(event.pos()) and index.data(BUTTON_ENABLED_ROLE):
+                self.clicked.emit(index.row(), index.column())
+            return pressed is not None
+        return False
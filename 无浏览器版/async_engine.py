@@ -0,0 +1,662 @@
+import time
+import codecs
+import atexit
+import random
+import asyncio
+import threading
+from datetime import datetime, timedelta
+import socket
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from yarl import URL
+import forum_site
+from account_store import account_store
+from cookie_jar import get_jar
+from dispatch_policy import make_bucket, task_priority, take_token, run_with_deadline
+from concurrency_controller import concurrency_controller, is_overload_status
+from resilience import RETRY_POLICIES, CircuitOpenError, call_with_retry
+from page_parser import strip_tags, find_formhash, has_sign_form, find_work_wait, has_space_link, find_space_username
+from metrics import (metrics, record_request, record_response, record_bytes, record_task,
+                     OUTCOME_OK, OUTCOME_HTTP_ERROR, OUTCOME_TIMEOUT, OUTCOME_ERROR)
+from log_config import setup_logger
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+# 请求地址由论坛地址和以下路径拼成，论坛地址变化时由 _apply_base_url 重新生成
+SIGN_PAGE_PATH = 'plugin.php?id=dsu_paulsign:sign'
+SIGN_PATH = 'plugin.php?id=dsu_paulsign:sign&operation=qiandao&infloat=1&inajax=1'
+WORK_PATH = 'plugin.php?id=np_cliworkdz:work'
+SIGN_PAGE_URL = forum_site.url(SIGN_PAGE_PATH)
+SIGN_URL = forum_site.url(SIGN_PATH)
+WORK_URL = forum_site.url(WORK_PATH)
+
+# 共享连接池参数
+CONNECTION_LIMIT = 100          # 连接池总连接数
+CONNECTION_LIMIT_PER_HOST = 20  # 单个主机的连接数
+KEEPALIVE_TIMEOUT = 60          # 空闲连接保留秒数
+MAX_CONNECTION_AGE = 600        # 连接池使用多少秒后换新，旧连接池中的连接随之关闭，0 表示不换
+PROBE_CHUNK_SIZE = 8192         # 流式读取页面时每次读取的字节数
+AD_CLICK_DELAY = (1.0, 2.0)     # 两次点广告之间随机等待的秒数范围
+# 单个请求的超时：连接 10 秒，两次读取之间 15 秒，整个请求 30 秒
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=10, sock_read=15)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36 Edg/135.0.0.0'
+SEC_CH_UA = '"Microsoft Edge";v="135", "Not-A.Brand";v="8", "Chromium";v="135"'
+# 只声明 aiohttp 一定能解压的编码，避免未安装 brotli/zstandard 时收到无法解码的响应
+ACCEPT_ENCODING = 'gzip, deflate'
+
+# 签到/打工页面请求头
+PAGE_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6',
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Connection': 'keep-alive',
+    'Host': forum_site.netloc(),
+    'Referer': forum_site.url(''),
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'same-origin',
+    'Sec-Fetch-User': '?1',
+    'Upgrade-Insecure-Requests': '1',
+    'sec-ch-ua': SEC_CH_UA,
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Windows"'
+}
+
+# 表单提交请求头（签到、领取打工奖励）
+FORM_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6',
+    'Cache-Control': 'max-age=0',
+    'Connection': 'keep-alive',
+    'Content-Type': 'application/x-www-form-urlencoded',
+    'Host': forum_site.netloc(),
+    'Origin': forum_site.base_url(),
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'same-origin',
+    'Sec-Fetch-User': '?1',
+    'Upgrade-Insecure-Requests': '1',
+    'User-Agent': USER_AGENT,
+    'sec-ch-ua': SEC_CH_UA,
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Windows"'
+}
+SIGN_HEADERS = dict(FORM_HEADERS, **{
+    'Referer': SIGN_PAGE_URL,
+    'Sec-Fetch-Dest': 'iframe',
+})
+WORK_HEADERS = dict(FORM_HEADERS, **{
+    'Referer': WORK_URL,
+    'Sec-Fetch-Dest': 'document',
+})
+
+# 点广告的 ajax 请求头
+AD_HEADERS = {
+    'Accept': '*/*',
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6',
+    'Connection': 'keep-alive',
+    'Content-Type': 'application/x-www-form-urlencoded',
+    'Host': forum_site.netloc(),
+    'Origin': forum_site.base_url(),
+    'Referer': WORK_URL,
+    'Sec-Fetch-Dest': 'empty',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Site': 'same-origin',
+    'User-Agent': USER_AGENT,
+    'X-Requested-With': 'XMLHttpRequest',
+    'sec-ch-ua': SEC_CH_UA,
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': 'Windows'
+}
+
+
+def _apply_base_url():
+    """按当前论坛地址重新生成请求地址，以及请求头中的 Host、Origin、Referer"""
+    global SIGN_PAGE_URL, SIGN_URL, WORK_URL
+    SIGN_PAGE_URL = forum_site.url(SIGN_PAGE_PATH)
+    SIGN_URL = forum_site.url(SIGN_PATH)
+    WORK_URL = forum_site.url(WORK_PATH)
+    PAGE_HEADERS.update({'Host': forum_site.netloc(), 'Referer': forum_site.url('')})
+    for headers in (FORM_HEADERS, SIGN_HEADERS, WORK_HEADERS, AD_HEADERS):
+        headers.update({'Host': forum_site.netloc(), 'Origin': forum_site.base_url()})
+    SIGN_HEADERS['Referer'] = SIGN_PAGE_URL
+    WORK_HEADERS['Referer'] = WORK_URL
+    AD_HEADERS['Referer'] = WORK_URL
+
+
+forum_site.add_listener(_apply_base_url)
+
+SIGN_LOGIN_REQUIRED = "您需要先登录才能继续本操作"
+SIGNED_TEXT = "您今天已经签到过了或者签到时间还未开始"
+WORK_LOGIN_REQUIRED = "请先登录再进行点击任务"
+WORK_SUCCESS_TEXT = '恭喜，您已经成功领取了奖励天使币'
+
+# 签到 ajax 响应的判定结果
+SIGN_RESULT_SUCCESS = 'success'         # 本次签到成功
+SIGN_RESULT_ALREADY = 'already'         # 今日已经签到过
+SIGN_RESULT_FAILURE = 'failure'         # 明确失败（未登录、表单验证失败）
+SIGN_RESULT_UNKNOWN = 'unknown'         # 无法判断，需要重新检查签到页面
+SIGN_SUCCESS_MARKERS = ('恭喜你签到成功', '签到成功')
+SIGN_ALREADY_MARKERS = ('您今日已经签到', '已经签到过了')
+SIGN_FAILURE_MARKERS = (SIGN_LOGIN_REQUIRED, '表单验证串不符', '请求来路不正确')
+
+# 请求出错时捕获的异常：网络错误、超时、主机熔断中
+REQUEST_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError)
+
+# 可供选择的签到心情 qdxq
+QDXQ_OPTIONS = ['kx', 'ng', 'ym', 'wl', 'nu', 'ch', 'fd', 'yl', 'shuai']
+
+
+def parse_sign_response(text):
+    """解析签到 ajax 请求的响应，返回 (判定结果, 提示文本)"""
+    message = strip_tags(text)
+    # “已经签到过了或者签到时间还未开始”无法区分两种情况，由签到页面按当前时间判断
+    if SIGNED_TEXT in message:
+        return SIGN_RESULT_UNKNOWN, message
+    # 先判断失败：未登录时的提示中也可能带有“签到”字样
+    for result, markers in ((SIGN_RESULT_FAILURE, SIGN_FAILURE_MARKERS),
+                            (SIGN_RESULT_ALREADY, SIGN_ALREADY_MARKERS),
+                            (SIGN_RESULT_SUCCESS, SIGN_SUCCESS_MARKERS)):
+        if any(marker in message for marker in markers):
+            return result, message
+    return SIGN_RESULT_UNKNOWN, message
+
+
+class AsyncEngine:
+    """
+    在后台线程中运行一个事件循环，所有账号的签到/打工协程共享同一个 aiohttp 连接池。
+    aiohttp 的连接池只按空闲时间关闭连接，连接的最长使用时间通过定期换用新的会话实现：
+    会话创建超过 max_connection_age 秒后，新请求改用新会话，旧会话等进行中的请求结束后关闭。
+    force_close 为 True 时每个请求都新建连接，只用于基准测试对比握手次数。
+    """
+
+    def __init__(self, limit=CONNECTION_LIMIT, limit_per_host=CONNECTION_LIMIT_PER_HOST,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT, max_connection_age=MAX_CONNECTION_AGE, force_close=False):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.max_connection_age = max_connection_age
+        self.force_close = force_close
+        self.trace_configs = []     # 额外的 aiohttp.TraceConfig，在创建会话之前添加
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+        self._client_created = 0.0
+        self._retired = {}          # 已换下的会话 -> 等待进行中的请求结束后关闭它的任务
+
+    def get_loop(self):
+        """获取后台事件循环，首次调用时启动循环线程"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='tsdm_async_engine', daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro):
+        """把协程提交到后台事件循环，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.get_loop())
+
+    def run_sync(self, coro):
+        """在后台事件循环中执行协程并阻塞等待结果"""
+        return self.submit(coro).result()
+
+    async def get_client(self):
+        """获取共享的 aiohttp 会话，cookie 由调用方按账号通过请求头传递"""
+        if (self._client is not None and not self._client.closed and self.max_connection_age > 0
+                and time.monotonic() - self._client_created > self.max_connection_age):
+            self._retire_client()
+        if self._client is None or self._client.closed:
+            if self.force_close:
+                connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                                 force_close=True, resolver=_TimedResolver())
+            else:
+                connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                                 keepalive_timeout=self.keepalive_timeout, resolver=_TimedResolver())
+            # 建立连接的耗时只能通过 trace 取得，而启用 trace 后每个请求都有额外开销，默认关闭
+            trace_configs = list(self.trace_configs)
+            if account_store.get_setting("trace_connections", False):
+                trace_configs.append(_make_trace_config())
+            self._client = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar(),
+                                                 timeout=REQUEST_TIMEOUT, trace_configs=trace_configs or None)
+            self._client_created = time.monotonic()
+        return self._client
+
+    def _retire_client(self):
+        """换下当前会话，等待一个请求的最长耗时后关闭，期间已经开始的请求继续使用旧连接"""
+        client, self._client = self._client, None
+
+        async def close_later():
+            await asyncio.sleep(REQUEST_TIMEOUT.total)
+            self._retired.pop(client, None)
+            await client.close()
+
+        self._retired[client] = asyncio.ensure_future(close_later())
+        logger.info(f"连接池已使用超过 {self.max_connection_age} 秒，换用新的连接池")
+
+    async def close(self):
+        retired, self._retired = self._retired, {}
+        for client, task in retired.items():
+            task.cancel()
+            await client.close()
+        if self._client is not None and not self._client.closed:
+            await self._client.close()
+        self._client = None
+
+    def shutdown(self, timeout=5):
+        """关闭共享会话并停止后台事件循环"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.close(), loop).result(timeout)
+        except Exception as e:
+            logger.error(f"关闭异步引擎会话时出错: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+
+# 进程内共享的异步引擎
+engine = AsyncEngine()
+atexit.register(engine.shutdown)
+
+
+def run_sync(coro):
+    return engine.run_sync(coro)
+
+
+def _sign_page_complete(text):
+    return (SIGN_LOGIN_REQUIRED in text or SIGNED_TEXT in text
+            or has_sign_form(text))
+
+
+def _work_page_complete(text):
+    return WORK_LOGIN_REQUIRED in text or find_work_wait(text) is not None
+
+
+def _login_state_complete(text):
+    return SIGN_LOGIN_REQUIRED in text or has_space_link(text)
+
+
+class _TimedResolver(AbstractResolver):
+    """记录 DNS 解析耗时的解析器，连接池缓存了解析结果时不会调用"""
+
+    def __init__(self):
+        self._resolver = aiohttp.DefaultResolver()
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        started = time.monotonic()
+        try:
+            return await self._resolver.resolve(host, port, family)
+        finally:
+            metrics.observe('tsdm_http_dns_seconds', time.monotonic() - started, host=host)
+
+    async def close(self):
+        await self._resolver.close()
+
+
+def _make_trace_config():
+    """记录新建连接（TCP 和 TLS 握手）的耗时，请求类型由 trace_request_ctx 的 action 传入"""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_connect_start(session, context, params):
+        context.connect_started = time.monotonic()
+
+    async def on_connect_end(session, context, params):
+        action = (context.trace_request_ctx or {}).get('action', 'page')
+        metrics.observe('tsdm_http_connect_seconds', time.monotonic() - context.connect_started, action=action)
+
+    trace_config.on_connection_create_start.append(on_connect_start)
+    trace_config.on_connection_create_end.append(on_connect_end)
+    return trace_config
+
+
+def _record_headers(action, started, status):
+    """收到响应头时记录首字节耗时和状态码"""
+    metrics.observe('tsdm_http_ttfb_seconds', time.monotonic() - started, action=action)
+    record_response(action, status)
+
+
+def _record_request(started, action, error=None):
+    """
+    记录请求总耗时和结果，并报告给并发控制器，连接失败、超时、429 和 5xx 计为错误。
+    """
+    elapsed = time.monotonic() - started
+    if isinstance(error, aiohttp.ClientResponseError):
+        failed = is_overload_status(error.status)
+        outcome = OUTCOME_HTTP_ERROR
+    elif isinstance(error, asyncio.TimeoutError):
+        failed = True
+        outcome = OUTCOME_TIMEOUT
+    else:
+        failed = error is not None
+        outcome = OUTCOME_ERROR if failed else OUTCOME_OK
+    concurrency_controller.record(elapsed, failed)
+    record_request(action, elapsed, outcome)
+
+
+async def _timed(coro, action):
+    """执行单次请求，记录耗时和结果"""
+    started = time.monotonic()
+    try:
+        result = await coro
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        _record_request(started, action, e)
+        raise
+    _record_request(started, action)
+    return result
+
+
+async def _fetch_page(url, jar, is_complete=None):
+    return await call_with_retry(lambda: _timed(_read_page(url, jar, is_complete), 'page'),
+                                 URL(url).host, RETRY_POLICIES['page'])
+
+
+async def _read_page(url, jar, is_complete=None):
+    """
+    带账号的 cookie 流式获取页面，返回已读取的页面文本，响应中的 Set-Cookie 合并进 cookie 罐。
+    is_complete(已读取的文本) 返回 True 时停止读取并断开连接，不再下载页面剩余部分。
+    """
+    client = await engine.get_client()
+    headers = dict(PAGE_HEADERS, Cookie=jar.header())
+    started = time.monotonic()
+    async with client.get(url, headers=headers, trace_request_ctx={'action': 'page'}) as response:
+        _record_headers('page', started, response.status)
+        response.raise_for_status()
+        jar.merge(response.cookies)
+        decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')(errors='ignore')
+        text = ''
+        bytes_read = 0
+        stopped_early = False
+        async for chunk in response.content.iter_chunked(PROBE_CHUNK_SIZE):
+            bytes_read += len(chunk)
+            text += decoder.decode(chunk)
+            if is_complete is not None and is_complete(text):
+                stopped_early = True
+                # 未读完的连接不能放回连接池，直接关闭
+                response.close()
+                break
+        else:
+            text += decoder.decode(b'', final=True)
+        record_bytes('page', bytes_read)
+        logger.info("请求成功，响应状态码: %d，读取 %d 字节，耗时 %.0f ms%s", response.status, bytes_read,
+                    (time.monotonic() - started) * 1000, "（已找到所需内容，提前结束读取）" if stopped_early else "")
+    return text
+
+
+async def _post(url, headers, data, params=None, action='qiandao'):
+    """提交表单，返回 (状态码, 响应文本)，action 决定出错时能否重试，见 resilience.RETRY_POLICIES"""
+    return await call_with_retry(lambda: _timed(_send_post(url, headers, data, params, action), action),
+                                 URL(url).host, RETRY_POLICIES[action])
+
+
+async def _send_post(url, headers, data, params=None, action='qiandao'):
+    client = await engine.get_client()
+    started = time.monotonic()
+    async with client.post(url, headers=headers, params=params, data=data,
+                           trace_request_ctx={'action': action}) as response:
+        _record_headers(action, started, response.status)
+        response.raise_for_status()
+        body = await response.read()
+        record_bytes(action, len(body))
+        return response.status, await response.text(errors='ignore')
+
+
+async def check_sign_status_async(username):
+    """
+    检查签到状态，返回 (是否已签到, 账号的 cookie 罐, formhash)，出错时返回 (None, None, None)。
+    """
+    jar = get_jar(username)
+    if jar is None:
+        logger.info(f"未找到 {username} 的登录信息，请检查。")
+        return None, None, None
+    try:
+        text = await _fetch_page(SIGN_PAGE_URL, jar, _sign_page_complete)
+    except REQUEST_ERRORS as e:
+        logger.error(f"请求出错: {e}")
+        return None, None, None
+
+    # 检查 cookie 是否失效
+    if SIGN_LOGIN_REQUIRED in text:
+        logger.info(f"{username} 的 cookie 已失效，更新登录信息。")
+        account_store.invalidate(username)
+        return None, None, None
+    account_store.mark_valid(username)
+
+    # 检查返回页面是否包含已签到文本且当前时间不在 0 点 - 1 点
+    now = datetime.now()
+    if SIGNED_TEXT in text and not (0 <= now.hour < 1):
+        logger.info("今日已签到")
+        account_store.update(username, last_sign_date=now.strftime("%Y-%m-%d"))
+        return True, None, None
+
+    formhash = find_formhash(text)
+    if formhash:
+        logger.info(f"找到 formhash: {formhash}")
+    else:
+        logger.info("未找到 formhash")
+
+    return False, jar, formhash
+
+
+async def check_cookie_async(username):
+    """
+    只读取签到页面开头的“访问我的空间”链接检查 cookie 是否有效：有效返回 True，失效返回 False，
+    请求出错或页面无法判断时返回 None。结果由调用方批量写入账号仓库。
+    """
+    jar = get_jar(username)
+    if jar is None:
+        logger.error(f"未找到 {username} 的登录信息，请检查。")
+        return None
+    try:
+        text = await _fetch_page(SIGN_PAGE_URL, jar, _login_state_complete)
+    except REQUEST_ERRORS as e:
+        logger.error(f"检查 {username} 的 cookie 时请求出错: {e}")
+        return None
+    if SIGN_LOGIN_REQUIRED in text:
+        return False
+    actual_username = find_space_username(text)
+    if actual_username is None:
+        logger.info(f"无法从页面判断 {username} 的登录状态")
+        return None
+    return actual_username == username
+
+
+async def perform_sign_async(username):
+    checked, jar, formhash = await check_sign_status_async(username)
+    if checked is None or checked is True:
+        return
+
+    # 签到请求前更新 s_gkr8_682f_lastact
+    sign_headers = dict(SIGN_HEADERS, Cookie=jar.touch_lastact())
+    sign_data = {
+        'formhash': formhash,
+        'qdxq': random.choice(QDXQ_OPTIONS),
+        'qdmode': '3',
+        'todaysay': '',
+        'fastreply': '1'
+    }
+
+    started = time.monotonic()
+    try:
+        status, sign_response_text = await _post(SIGN_URL, sign_headers, sign_data)
+        logger.info("签到请求成功，响应状态码: %d，耗时 %.0f ms", status, (time.monotonic() - started) * 1000)
+    except REQUEST_ERRORS as e:
+        logger.error(f"签到请求出错: {e}")
+        return
+
+    # 直接根据签到响应判断结果，只有无法判断时才重新检查签到页面
+    result, message = parse_sign_response(sign_response_text)
+    if result in (SIGN_RESULT_SUCCESS, SIGN_RESULT_ALREADY):
+        account_store.update(username, last_sign_date=datetime.now().strftime("%Y-%m-%d"))
+        logger.info("签到成功。" if result == SIGN_RESULT_SUCCESS else "今日已签到")
+    elif result == SIGN_RESULT_FAILURE:
+        if SIGN_LOGIN_REQUIRED in message:
+            logger.info(f"{username} 的 cookie 已失效，更新登录信息。")
+            account_store.invalidate(username)
+        logger.info(f"签到出错: {message}")
+    else:
+        logger.info(f"无法识别签到响应: {message[:100]}，重新检查签到状态")
+        recheck, _, _ = await check_sign_status_async(username)
+        if recheck:
+            logger.info("签到成功。")
+        else:
+            logger.info("签到出错。")
+
+
+async def check_work_status_async(username):
+    """
+    检查打工状态，可以打工时返回账号的 cookie 罐，冷却中或出错时返回 None。
+    """
+    jar = get_jar(username)
+    if jar is None:
+        logger.error(f"未找到 {username} 的登录信息，请检查。")
+        return None
+    try:
+        text = await _fetch_page(WORK_URL, jar, _work_page_complete)
+    except REQUEST_ERRORS as e:
+        logger.error(f"请求出错: {e}")
+        return None
+
+    # 检查 cookie 是否失效
+    if WORK_LOGIN_REQUIRED in text:
+        logger.info(f"{username} 的 cookie 已失效，更新登录信息。")
+        account_store.invalidate(username)
+        return None
+    account_store.mark_valid(username)
+
+    # 提取等待时间，先减去 6 小时，再加上等待时间得到上次打工时间
+    wait_time = find_work_wait(text)
+    if wait_time is not None:
+        last_work_time = datetime.now() - timedelta(hours=6) + wait_time
+        account_store.update(username, last_work_time=last_work_time.strftime("%Y-%m-%d %H:%M:%S"))
+        logger.info(f"{username} 已打过工，正在冷却状态。")
+        return None
+
+    return jar
+
+
+def _skip_work_check(username):
+    """
+    cookie 在有效期缓存内且记录的打工冷却已经结束时，可以不加载打工页面直接点广告，
+    返回账号的 cookie 罐，否则返回 None。
+    """
+    if account_store.work_deadline(username) > time.time() or not account_store.is_recently_valid(username):
+        return None
+    jar = get_jar(username)
+    if not jar:
+        return None
+    logger.info(f"{username} 的 cookie 在有效期缓存内，跳过打工页面检查。")
+    return jar
+
+
+async def _recheck_work_status(username, response_text):
+    """跳过了打工页面检查而打工请求没有成功时，根据响应或重新加载打工页面更新登录和冷却状态"""
+    if WORK_LOGIN_REQUIRED in response_text:
+        logger.info(f"{username} 的 cookie 已失效，更新登录信息。")
+        account_store.invalidate(username)
+        return
+    logger.info(f"重新检查 {username} 的打工状态。")
+    await check_work_status_async(username)
+
+
+async def perform_work_async(username, verify=None):
+    """
+    点广告并领取打工奖励，成功后直接记录打工时间。
+    cookie 在有效期缓存内时跳过打工页面检查，请求失败时再加载打工页面确认状态。
+    verify 为 True 时领取后再检查一次打工页面确认进入冷却，默认读取 verify_work 设置。
+    """
+    if verify is None:
+        verify = account_store.get_setting("verify_work", False)
+    jar = _skip_work_check(username)
+    skipped_check = jar is not None
+    if not skipped_check:
+        jar = await check_work_status_async(username)
+    if jar is None:
+        return
+    if not jar:
+        logger.error("未获取到有效的Cookie字符串，无法继续操作。")
+        return
+
+    ad_params = {'id': 'np_cliworkdz:work'}
+    while True:
+        # 每次请求前更新 s_gkr8_682f_lastact，只替换请求头中时间戳的部分
+        ad_headers = dict(AD_HEADERS, Cookie=jar.touch_lastact())
+        started = time.monotonic()
+        try:
+            status, ad_response_text = await _post(WORK_URL, ad_headers, {'act': 'clickad'}, params=ad_params, action='clickad')
+        except REQUEST_ERRORS as e:
+            logger.error(f"点广告请求出错: {e}")
+            return
+        logger.info("点广告请求成功，响应状态码: %d，耗时 %.0f ms", status, (time.monotonic() - started) * 1000)
+        ad_response_text = ad_response_text.strip()
+        logger.info("点广告响应内容: %s", ad_response_text)
+
+        if ad_response_text == "6":
+            logger.info("点广告获得返回值 6，开始打工请求。")
+            break
+        elif ad_response_text in ["1", "2", "3", "4", "5"]:
+            # 等待 1 - 2 秒，等待期间事件循环可以处理其他账号的请求
+            sleep_time = random.uniform(*AD_CLICK_DELAY)
+            logger.info(f"点广告返回值为 {ad_response_text}，等待 {sleep_time:.3f} 秒后继续请求。")
+            await asyncio.sleep(sleep_time)
+        else:
+            logger.error(f"点广告收到意外返回值 {ad_response_text}，停止操作。")
+            if WORK_LOGIN_REQUIRED in ad_response_text or skipped_check:
+                await _recheck_work_status(username, ad_response_text)
+            return
+
+    # 打工请求前更新 s_gkr8_682f_lastact
+    work_headers = dict(WORK_HEADERS, Cookie=jar.touch_lastact())
+    started = time.monotonic()
+    try:
+        status, work_response_text = await _post(WORK_URL, work_headers, {'act': 'getcre'}, params=ad_params, action='getcre')
+    except REQUEST_ERRORS as e:
+        # 领取奖励不能重复提交，由下一次任务先检查打工页面确认是否已经领取
+        logger.error(f"打工请求出错: {e}，稍后重新检查打工状态")
+        return
+    logger.info("打工请求成功，响应状态码: %d，耗时 %.0f ms", status, (time.monotonic() - started) * 1000)
+
+    if WORK_SUCCESS_TEXT not in work_response_text:
+        logger.info("打工出错，未收到领取成功的响应。")
+        if WORK_LOGIN_REQUIRED in work_response_text or skipped_check:
+            await _recheck_work_status(username, work_response_text)
+        return
+
+    # 领取成功即开始冷却，直接记录打工时间，同时说明 cookie 仍然有效
+    now = datetime.now()
+    account_store.update(username, last_work_time=now.strftime("%Y-%m-%d %H:%M:%S"), is_valid=True,
+                         last_valid_time=now.strftime("%Y-%m-%d %H:%M:%S"))
+    logger.info("打工完成。")
+    if verify:
+        # 再次检查打工状态，进入冷却说明打工已完成，并按页面的等待时间校正打工时间
+        recheck = await check_work_status_async(username)
+        if recheck is not None:
+            logger.info("打工状态校验失败，打工页面未显示冷却时间。")
+
+
+async def run_batch(tasks, concurrency=CONNECTION_LIMIT_PER_HOST, max_rate=None):
+    """
+    在同一个事件循环中并发执行一批 (任务类型, 用户名) 任务，同一账号的任务按优先级顺序执行。
+    max_rate 不为空时，每秒最多启动 max_rate 个任务。
+    """
+    handlers = {'sign': perform_sign_async, 'work': perform_work_async}
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = make_bucket(max_rate)
+    by_account = {}
+    for task_type, username in sorted(tasks, key=lambda task: task_priority(task[0])):
+        by_account.setdefault(username, []).append(task_type)
+
+    async def run_account(username, task_types):
+        for task_type in task_types:
+            async with semaphore:
+                await take_token(bucket)
+                started = time.monotonic()
+                _, outcome = await run_with_deadline(handlers[task_type](username), f"执行 {username} 的 {task_type} 任务")
+                record_task(task_type, time.monotonic() - started, outcome)
+
+    await asyncio.gather(*(run_account(username, task_types) for username, task_types in by_account.items()))
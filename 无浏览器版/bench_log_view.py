@@ -0,0 +1,67 @@
+"""
+日志面板内存测试：向日志控件追加 100 万行日志，对比常驻内存。
+  before: 旧写法，QTextEdit.insertPlainText 无限追加
+  after : 新写法，QPlainTextEdit 限制最大行数，按批次 appendPlainText
+
+用法: python bench_log_view.py [行数]    （需要安装 psutil）
+"""
+import os
+import sys
+import time
+import subprocess
+
+LINE = "2025-01-01 01:00:00,000 - INFO - 点广告请求成功，响应状态码: 200"
+BATCH = 250             # 每批行数，对应日志信号每次发送的内容
+LOG_MAX_BLOCKS = 2000   # 与 main.LOG_MAX_BLOCKS 保持一致（main 依赖 winreg，这里不直接导入）
+TIME_LIMIT = 300        # 单种写法的最长测试秒数，旧写法追加越来越慢，超时后按已追加的行数报告
+
+
+def measure(mode, total_lines):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import psutil
+    from PyQt5.QtWidgets import QApplication, QTextEdit, QPlainTextEdit
+
+    app = QApplication(sys.argv)
+    process = psutil.Process()
+    if mode == 'before':
+        widget = QTextEdit()
+        widget.setReadOnly(True)
+    else:
+        widget = QPlainTextEdit()
+        widget.setReadOnly(True)
+        widget.setUndoRedoEnabled(False)
+        widget.setMaximumBlockCount(LOG_MAX_BLOCKS)
+    widget.show()
+    app.processEvents()
+    baseline = process.memory_info().rss
+
+    started = time.perf_counter()
+    batch = '\n'.join([LINE] * BATCH)
+    appended = 0
+    while appended < total_lines and time.perf_counter() - started < TIME_LIMIT:
+        if mode == 'before':
+            widget.insertPlainText(batch + '\n')
+            widget.moveCursor(widget.textCursor().End)
+        else:
+            widget.appendPlainText(batch)
+        app.processEvents()
+        appended += BATCH
+    elapsed = time.perf_counter() - started
+    rss = process.memory_info().rss
+    note = "" if appended >= total_lines else f"（{TIME_LIMIT} 秒超时）"
+    print(f"{mode}: {appended} 行{note}，耗时 {elapsed:.1f} 秒，"
+          f"常驻内存 {rss / 1024 / 1024:.1f} MB（增长 {(rss - baseline) / 1024 / 1024:.1f} MB）")
+
+
+def main():
+    if len(sys.argv) > 2:
+        measure(sys.argv[1], int(sys.argv[2]))
+        return
+    total_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    # 每种写法在独立进程中测量，避免互相影响
+    for mode in ('before', 'after'):
+        subprocess.run([sys.executable, __file__, mode, str(total_lines)], check=True)
+
+
+if __name__ == "__main__":
+    main()
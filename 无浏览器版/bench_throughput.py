@@ -0,0 +1,326 @@
+"""
+端到端吞吐量基准测试：在本地替身论坛（fake_forum.py）上生成 N 个已登录账号，
+由调度器（DeadlineScheduler）找出到期任务，交给任务执行器执行 perform_sign / perform_work，
+分别统计签到、打工两个阶段的每分钟完成账号数、任务耗时 p50/p95/p99、峰值内存，以及每个账号的请求数和响应字节数。
+新建连接数（握手次数）通过 aiohttp 的 TraceConfig 统计，--no-keepalive 时每个请求都新建连接，
+用于对比共享连接池之前每次请求新建会话的握手次数。
+
+每个规模在独立进程中运行，峰值内存互不影响；替身论坛在另一个进程中运行，不与被测代码争用 GIL。
+账号配置和日志都写在临时目录中，不会改动程序目录下的 login_info.json 和 tsdm_sign_tools.log。
+结果写入 JSON 文件，可以用 --baseline 与之前的结果对比。
+
+用法:
+    python bench_throughput.py                          # 依次测试 10、100、1000、10000 个账号
+    python bench_throughput.py --sizes 10 100 --latency 0.02
+    python bench_throughput.py --baseline bench_results/throughput_20250101_010000.json
+    python bench_throughput.py --sizes 100 --no-keepalive     # 每个请求新建连接，对比握手次数
+
+点广告之间的等待默认设为 0（--ad-delay 可以改回 1 2），否则打工耗时主要是固定的等待时间。
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from datetime import datetime
+from log_config import LOG_FILE_ENV
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULT_DIR = os.path.join(BENCH_DIR, 'bench_results')
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+PHASES = ('sign', 'work')
+RUN_TIMEOUT = 3600          # 单个阶段的最长秒数
+
+
+def percentile(sorted_values, fraction):
+    """最近秩法百分位数，sorted_values 为升序列表"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss_mb():
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 为单位，macOS 以字节为单位
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def fetch_server_stats(base_url, reset=False):
+    with urllib.request.urlopen(f"{base_url}/_stats{'?reset=1' if reset else ''}", timeout=10) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def make_handshake_counter():
+    """返回 (TraceConfig, 计数列表)，每新建一个连接（一次 TCP 握手，HTTPS 时还有一次 TLS 握手）计数加一"""
+    import aiohttp
+
+    handshakes = [0]
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_connection_create_end(session, context, params):
+        handshakes[0] += 1
+
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    return trace_config, handshakes
+
+
+def run_phase(task_type, usernames, handler, args, base_url, handshakes):
+    """用任务执行器执行一批同类任务，返回该阶段的统计结果"""
+    from task_executor import TaskExecutor
+    from async_engine import engine
+    from concurrency_controller import concurrency_controller
+
+    latencies = []
+    finished = threading.Event()
+    lock = threading.Lock()
+    done = [0]
+
+    async def timed(username):
+        started = time.perf_counter()
+        try:
+            await handler(username)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    def on_finished(finished_type, username):
+        with lock:
+            done[0] += 1
+            if done[0] >= len(usernames):
+                finished.set()
+
+    executor = TaskExecutor({task_type: timed}, max_workers=args.max_workers, max_per_host=args.max_workers,
+                            on_finished=on_finished, loop=engine.get_loop(), max_rate=args.max_rate,
+                            controller=concurrency_controller)
+    fetch_server_stats(base_url, reset=True)
+    handshakes_before = handshakes[0]
+    started = time.perf_counter()
+    for username in usernames:
+        executor.submit(task_type, username)
+    all_finished = finished.wait(RUN_TIMEOUT)
+    elapsed = time.perf_counter() - started
+    executor.shutdown()
+    server = fetch_server_stats(base_url, reset=True)
+    handshake_count = handshakes[0] - handshakes_before
+
+    latencies.sort()
+    count = len(usernames)
+    return {
+        'accounts': count,
+        'all_finished': all_finished,
+        'seconds': round(elapsed, 3),
+        'accounts_per_minute': round(count / elapsed * 60, 1) if elapsed else None,
+        'latency_p50': percentile(latencies, 0.50),
+        'latency_p95': percentile(latencies, 0.95),
+        'latency_p99': percentile(latencies, 0.99),
+        'requests_per_account': round(server.get('requests', 0) / count, 2),
+        'bytes_per_account': round(server.get('bytes', 0) / count),
+        'handshakes': handshake_count,
+        'handshakes_per_task': round(handshake_count / count, 2),
+        'server_errors': sum(value for key, value in server.items()
+                             if key.startswith('status_') and key != 'status_200'),
+        'executor': executor.stats(),
+    }
+
+
+def run_size(size, args):
+    """子进程中执行：生成账号，按调度器给出的到期任务依次跑签到、打工两个阶段"""
+    import config_handler
+    import fake_forum
+    import async_engine
+    from log_config import setup_logger
+    from account_store import account_store
+    from scheduler import DeadlineScheduler
+
+    if args.quiet:
+        setup_logger('tsdm_sign_tools.log').setLevel('WARNING')
+    async_engine.AD_CLICK_DELAY = tuple(args.ad_delay)
+    async_engine.engine.force_close = args.no_keepalive
+    trace_config, handshakes = make_handshake_counter()
+    async_engine.engine.trace_configs.append(trace_config)
+    base_url = os.environ['TSDM_BASE_URL']
+
+    workdir = tempfile.mkdtemp(prefix='tsdm_bench_')
+    config_handler.CONFIG_FILE = os.path.join(workdir, 'login_info.json')
+    prefix = f"bench{size}_{int(time.time())}_"
+    with open(config_handler.CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"accounts": [fake_forum.make_account(f"{prefix}{i}") for i in range(size)]}, f)
+    account_store.load()
+
+    scheduler = DeadlineScheduler()
+    scheduler.sync_accounts(account_store.all_accounts())
+    due = {task_type: [] for task_type in PHASES}
+    for task_type, username in scheduler.pop_due():
+        due.setdefault(task_type, []).append(username)
+
+    handlers = {'sign': async_engine.perform_sign_async, 'work': async_engine.perform_work_async}
+    result = {'size': size}
+    for task_type in PHASES:
+        if not due[task_type]:
+            result[task_type] = None
+            continue
+        result[task_type] = run_phase(task_type, due[task_type], handlers[task_type], args, base_url,
+                                      handshakes)
+
+    account_store.flush()
+    accounts = account_store.all_accounts().values()
+    result['signed'] = sum(1 for account in accounts if account.get('last_sign_date'))
+    result['worked'] = sum(1 for account in accounts if account.get('last_work_time'))
+    peak = peak_rss_mb()
+    result['peak_rss_mb'] = round(peak, 1) if peak is not None else None
+    async_engine.engine.shutdown()
+    print(json.dumps(result, ensure_ascii=False))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args):
+    port = free_port()
+    command = [sys.executable, os.path.join(BENCH_DIR, 'fake_forum.py'), '--port', str(port),
+               '--latency', str(args.latency), '--jitter', str(args.jitter),
+               '--error-rate', str(args.error_rate), '--rate', str(args.server_rate)]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            fetch_server_stats(base_url)
+            return server, base_url
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("替身论坛启动失败")
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline=None):
+    previous = {}
+    for result in (baseline or {}).get('results', []):
+        for task_type in PHASES:
+            if result.get(task_type):
+                previous[(result['size'], task_type)] = result[task_type]['accounts_per_minute']
+
+    print(f"{'账号数':>8} {'阶段':<5}{'账号/分钟':>11}{'p50(s)':>9}{'p95(s)':>9}{'p99(s)':>9}"
+          f"{'请求/账号':>10}{'字节/账号':>11}{'握手/任务':>10}{'峰值内存MB':>11}  对比基准")
+    for result in results:
+        for task_type in PHASES:
+            phase = result.get(task_type)
+            if not phase:
+                continue
+            change = ''
+            old = previous.get((result['size'], task_type))
+            if old:
+                change = f"{(phase['accounts_per_minute'] - old) / old:+.1%}"
+            print(f"{result['size']:>8} {task_type:<5}{phase['accounts_per_minute']:>11.1f}"
+                  f"{phase['latency_p50']:>9.3f}{phase['latency_p95']:>9.3f}{phase['latency_p99']:>9.3f}"
+                  f"{phase['requests_per_account']:>10.2f}{phase['bytes_per_account']:>11}"
+                  f"{phase.get('handshakes_per_task', 0):>10.2f}"
+                  f"{result['peak_rss_mb'] or 0:>11.1f}  {change}")
+
+
+def use_temp_log_file():
+    """在导入程序模块之前把日志改写到临时目录，子进程和替身论坛通过环境变量继承，返回日志文件路径"""
+    if not os.environ.get(LOG_FILE_ENV):
+        os.environ[LOG_FILE_ENV] = os.path.join(tempfile.mkdtemp(prefix='tsdm_bench_'), 'tsdm_sign_tools.log')
+    return os.environ[LOG_FILE_ENV]
+
+
+def main(argv=None):
+    log_file = use_temp_log_file()
+    parser = argparse.ArgumentParser(prog='bench_throughput', description='签到/打工端到端吞吐量基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='测试的账号数')
+    parser.add_argument('--max-workers', type=int, default=None, help='同时执行的任务数上限，默认与程序相同')
+    parser.add_argument('--max-rate', type=float, default=0, help='每秒最多启动的任务数，默认 0 不限速')
+    parser.add_argument('--ad-delay', type=float, nargs=2, default=[0, 0], metavar=('MIN', 'MAX'),
+                        help='两次点广告之间的等待秒数范围，默认 0 0')
+    parser.add_argument('--latency', type=float, default=0.0, help='替身论坛每个请求的延迟秒数')
+    parser.add_argument('--jitter', type=float, default=0.0, help='替身论坛每个请求额外随机延迟的上限秒数')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='替身论坛返回 503 的比例')
+    parser.add_argument('--server-rate', type=float, default=0, help='替身论坛每秒最多处理的请求数，0 表示不限流')
+    parser.add_argument('--no-keepalive', action='store_true',
+                        help='每个请求都新建连接，用于对比使用共享连接池之前的握手次数')
+    parser.add_argument('--quiet', action='store_true', help='只记录 WARNING 以上的日志，排除写日志的开销')
+    parser.add_argument('--output', help='结果 JSON 文件路径，默认写入 bench_results 目录')
+    parser.add_argument('--baseline', help='之前的结果 JSON 文件，用于对比每分钟完成账号数')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.max_workers is None:
+        from task_executor import MAX_WORKERS
+        args.max_workers = MAX_WORKERS
+    if args.child is not None:
+        run_size(args.child, args)
+        return 0
+
+    server, base_url = start_server(args)
+    results = []
+    try:
+        env = dict(os.environ, TSDM_BASE_URL=base_url)
+        child_args = list(argv if argv is not None else sys.argv[1:])
+        for size in args.sizes:
+            print(f"正在测试 {size} 个账号...", flush=True)
+            completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', str(size)] + child_args,
+                                       env=env, capture_output=True, text=True, encoding='utf-8')
+            if completed.returncode != 0:
+                print(completed.stderr[-2000:], file=sys.stderr)
+                return 1
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {key: value for key, value in vars(args).items()
+                     if key not in ('output', 'baseline', 'child', 'sizes')},
+        'results': results,
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULT_DIR, exist_ok=True)
+        output = os.path.join(RESULT_DIR, f"throughput_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+    print(f"结果已保存到 {output}，日志保存在 {log_file}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import math
+import threading
+from log_config import setup_logger
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+INITIAL_LIMIT = 2           # 初始并发数，之后按论坛响应情况逐步增加
+SAMPLE_WINDOW = 20          # 每收集多少个请求样本调整一次并发数
+ERROR_RATE_THRESHOLD = 0.1  # 窗口内错误率超过该值时减半并发
+LATENCY_TOLERANCE = 2.0     # 窗口平均延迟超过基准延迟的倍数时减半并发
+MIN_SLOW_LATENCY = 1.0      # 平均延迟低于该秒数时不视为变慢，避免基准过小导致误判
+BASELINE_RELAX = 1.1        # 每个窗口基准延迟最多上调的比例，网络整体变慢后基准可以跟上
+DECREASE_FACTOR = 0.5       # 乘性减小的比例
+
+
+class AIMDController:
+    """
+    加性增、乘性减的并发控制器：
+    根据签到、打工、登录请求的延迟和错误率调整同时执行的账号数，
+    论坛响应正常时每个窗口加 1，变慢或出错时减半。
+    """
+
+    def __init__(self, maximum, minimum=1, initial=INITIAL_LIMIT, window=SAMPLE_WINDOW):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.limit = max(minimum, min(initial, maximum))
+        self._lock = threading.Lock()
+        self._latencies = []
+        self._errors = 0
+        self._baseline = None           # 基准延迟：响应正常时的窗口平均延迟
+        self._last_latency = 0.0        # 上一个窗口的平均延迟
+        self._last_error_rate = 0.0     # 上一个窗口的错误率
+        self._just_decreased = False    # 刚减半过：下一个窗口里还有减半前发出的请求，不再重复减半
+        self._listeners = []
+
+    def set_maximum(self, maximum):
+        with self._lock:
+            self.maximum = max(self.minimum, maximum)
+            self.limit = min(self.limit, self.maximum)
+
+    def add_listener(self, callback):
+        """并发数变化时调用 callback(新并发数)，在记录样本的线程中调用"""
+        self._listeners.append(callback)
+
+    def record(self, latency, error=False):
+        """记录一次请求的耗时（秒）和是否出错，凑满一个窗口后调整并发数"""
+        with self._lock:
+            self._latencies.append(latency)
+            self._errors += bool(error)
+            if len(self._latencies) < self.window:
+                return
+            old_limit = self.limit
+            reason = self._adjust_locked()
+            new_limit = self.limit
+        if new_limit != old_limit:
+            logger.info(f"并发数 {old_limit} -> {new_limit}（{reason}）")
+            for callback in self._listeners:
+                try:
+                    callback(new_limit)
+                except Exception as e:
+                    logger.error(f"通知并发数变化时出错: {e}")
+
+    def _adjust_locked(self):
+        average = sum(self._latencies) / len(self._latencies)
+        error_rate = self._errors / len(self._latencies)
+        self._latencies = []
+        self._errors = 0
+        self._last_latency = average
+        self._last_error_rate = error_rate
+        reason = f"窗口平均延迟 {average:.2f} 秒，错误率 {error_rate:.0%}"
+
+        slow = (self._baseline is not None and average > MIN_SLOW_LATENCY
+                and average > self._baseline * LATENCY_TOLERANCE)
+        if error_rate > ERROR_RATE_THRESHOLD or slow:
+            if not self._just_decreased:
+                self.limit = max(self.minimum, math.floor(self.limit * DECREASE_FACTOR))
+            self._just_decreased = not self._just_decreased
+        else:
+            self.limit = min(self.maximum, self.limit + 1)
+            self._just_decreased = False
+        if error_rate <= ERROR_RATE_THRESHOLD:
+            if self._baseline is None:
+                self._baseline = average
+            else:
+                self._baseline = min(average, self._baseline * BASELINE_RELAX)
+        return reason
+
+    def snapshot(self):
+        """返回当前状态，用于界面和日志显示"""
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "maximum": self.maximum,
+                "latency": self._last_latency,
+                "error_rate": self._last_error_rate,
+            }
+
+    def describe(self):
+        state = self.snapshot()
+        return (f"并发 {state['limit']}/{state['maximum']}  延迟 {state['latency'] * 1000:.0f} ms  "
+                f"错误率 {state['error_rate']:.0%}")
+
+
+def is_overload_status(status):
+    """429 和 5xx 说明论坛已经过载，计为错误"""
+    return status == 429 or status >= 500
+
+
+# 进程内共享的并发控制器，上限由任务执行器按 max_workers 设置
+concurrency_controller = AIMDController(maximum=INITIAL_LIMIT)
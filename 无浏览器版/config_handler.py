@@ -63,29 +63,17 @@ def save_config(config):
 
 def update_account_info(username, cookies, is_valid=True, last_sign_date="", last_work_time=""):
     """
-    更新用户账户信息。
+    更新用户账户信息，经由账号仓库合并写回配置文件。
     """
-    config = load_config()
-    accounts = config.get("accounts", [])
-    account_found = False
-    for account in accounts:
-        if account["username"] == username:
-            account["cookies"] = cookies
-            account["is_valid"] = is_valid
-            account["last_sign_date"] = last_sign_date
-            account["last_work_time"] = last_work_time
-            account_found = True
-            break
-    if not account_found:
-        new_account = {
-            "base_url": "https://www.tsdm39.com/",
-            "username": username,
-            "password": "",  # 若没有密码更新，可保持为空
-            "last_sign_date": last_sign_date,
-            "last_work_time": last_work_time,
-            "is_valid": is_valid,
-            "cookies": cookies
-        }
-        accounts.append(new_account)
-    config["accounts"] = accounts
-    save_config(config)
\ No newline at end of file
+    from account_store import account_store
+    account_store.upsert(
+        username,
+        cookies=cookies,
+        is_valid=is_valid,
+        last_sign_date=last_sign_date,
+        last_work_time=last_work_time
+    )
+    if is_valid:
+        # 刚登录得到的 cookie 视为已确认有效
+        account_store.mark_valid(username)
+    account_store.flush()
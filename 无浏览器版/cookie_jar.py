@@ -0,0 +1,138 @@
+"""
+每个账号一个的 cookie 罐：按名称保存 cookie，缓存拼好的 Cookie 请求头。
+s_gkr8_682f_lastact（最后活动时间）在请求头中的位置固定，更新时间戳时只替换这一段，
+点广告等连续请求不再每次查找子串、重新拼接整个请求头。
+页面响应中的 Set-Cookie 合并进来后，除 lastact 以外的取值有变化时才写回账号仓库。
+"""
+import time
+import threading
+from http.cookies import Morsel
+from account_store import account_store
+from log_config import setup_logger
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+LASTACT_COOKIE = 's_gkr8_682f_lastact'
+LASTACT_SEPARATOR = '%09'   # lastact 的格式为 时间戳%09页面%09
+
+
+class CookieJar:
+    """
+    单个账号的 cookie。username 为空时只在内存中使用（例如登录过程中），不写回账号仓库。
+    本身不加锁，同一账号同一时间只有一个任务在执行。
+    """
+
+    def __init__(self, cookies=(), username=None):
+        self.username = username
+        self.source = cookies       # 构造时使用的账号仓库中的 cookie 列表，用于判断账号是否重新登录过
+        self._values = {cookie["name"]: cookie["value"] for cookie in cookies}
+        self._header = None
+        self._prefix = None         # 请求头中 lastact 时间戳之前的部分，没有 lastact 时为整个请求头
+        self._suffix = None         # 请求头中 lastact 时间戳之后的部分，没有 lastact 时为 None
+        self._lastact_time = None
+        self._lastact_rest = None   # lastact 取值中时间戳之后的部分
+
+    @classmethod
+    def from_values(cls, values, username=None):
+        """由 名称 -> 取值 的字典创建"""
+        return cls([{"name": name, "value": value} for name, value in values.items()], username)
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, name, default=None):
+        return self._values.get(name, default)
+
+    def values(self):
+        """返回 名称 -> 取值 的字典副本"""
+        return dict(self._values)
+
+    def to_list(self):
+        """返回账号仓库使用的 [{"name": ..., "value": ...}] 列表，保留原列表中的其他字段"""
+        original = {cookie["name"]: cookie for cookie in self.source}
+        return [dict(original.get(name, {"name": name}), value=value) for name, value in self._values.items()]
+
+    def header(self):
+        """返回 Cookie 请求头，cookie 没有变化时直接返回缓存"""
+        if self._header is None:
+            self._build_header()
+        return self._header
+
+    def touch_lastact(self, now=None):
+        """把 lastact 的时间戳更新为当前时间，返回更新后的 Cookie 请求头"""
+        header = self.header()
+        if self._suffix is None:
+            return header
+        timestamp = str(int(time.time() if now is None else now))
+        if timestamp != self._lastact_time:
+            self._lastact_time = timestamp
+            self._values[LASTACT_COOKIE] = timestamp + self._lastact_rest
+            self._header = self._prefix + timestamp + self._suffix
+        return self._header
+
+    def merge(self, cookies):
+        """
+        合并响应中的 cookie（名称 -> 取值或 Morsel），返回是否有变化。
+        lastact 以外的取值有变化且绑定了账号时，写回账号仓库。
+        """
+        changed = False
+        persist = False
+        for name, value in cookies.items():
+            if isinstance(value, Morsel):
+                value = value.value
+            if self._values.get(name) == value:
+                continue
+            self._values[name] = value
+            changed = True
+            if name != LASTACT_COOKIE:
+                persist = True
+        if changed:
+            self._header = None
+        if persist and self.username is not None:
+            self.persist()
+        return changed
+
+    def persist(self):
+        """把当前的 cookie 写回账号仓库，由账号仓库合并写盘"""
+        cookies = self.to_list()
+        if account_store.update(self.username, cookies=cookies):
+            self.source = cookies
+
+    def _build_header(self):
+        parts = [f"{name}={value}" for name, value in self._values.items()]
+        lastact = self._values.get(LASTACT_COOKIE, '')
+        if LASTACT_SEPARATOR not in lastact:
+            self._prefix, self._suffix, self._lastact_time = "; ".join(parts), None, None
+            self._header = self._prefix
+            return
+        index = list(self._values).index(LASTACT_COOKIE)
+        timestamp, rest = lastact.split(LASTACT_SEPARATOR, 1)
+        before = "; ".join(parts[:index])
+        after = "; ".join(parts[index + 1:])
+        self._prefix = (before + "; " if before else "") + LASTACT_COOKIE + "="
+        self._suffix = LASTACT_SEPARATOR + rest + ("; " + after if after else "")
+        self._lastact_time = timestamp
+        self._lastact_rest = LASTACT_SEPARATOR + rest
+        self._header = self._prefix + timestamp + self._suffix
+
+
+_jars = {}
+_jars_lock = threading.Lock()
+
+
+def get_jar(username):
+    """获取账号的 cookie 罐，账号不存在时返回 None；账号重新登录换了 cookie 后重新创建"""
+    account = account_store.get(username)
+    if account is None:
+        return None
+    cookies = account.get("cookies", [])
+    with _jars_lock:
+        jar = _jars.get(username)
+        if jar is None or jar.source is not cookies:
+            jar = _jars[username] = CookieJar(cookies, username)
+    return jar
+
+
+def drop_jar(username):
+    with _jars_lock:
+        _jars.pop(username, None)
@@ -0,0 +1,84 @@
+"""
+批量检查所有账号的 cookie 是否仍然有效：在同一个事件循环中并发请求，
+用信号量限制同时进行的检查数，用令牌桶限制每秒发出的检查数。
+结果一次性写入账号仓库并只写一次配置文件，最后汇总失效、出错的账号。
+
+有效期缓存（validity_ttl）内确认过有效的账号默认跳过，force=True 时全部重新检查。
+"""
+import time
+import asyncio
+from log_config import setup_logger
+from account_store import account_store
+from dispatch_policy import make_bucket, take_token, run_with_deadline
+from async_engine import engine, check_cookie_async, CONNECTION_LIMIT_PER_HOST
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+SWEEP_CONCURRENCY = CONNECTION_LIMIT_PER_HOST   # 同时进行的检查数
+SWEEP_MAX_RATE = 50.0                           # 每秒最多发出的检查数，0 表示不限速
+SWEEP_RATE_BURST = 10                           # 令牌桶容量
+
+
+def select_accounts(force=False):
+    """返回 (需要检查的用户名列表, 有效期内跳过的用户名列表)"""
+    to_check, skipped = [], []
+    for username in account_store.all_accounts():
+        if not force and account_store.is_recently_valid(username):
+            skipped.append(username)
+        else:
+            to_check.append(username)
+    return to_check, skipped
+
+
+async def sweep_async(usernames, concurrency=SWEEP_CONCURRENCY, max_rate=SWEEP_MAX_RATE):
+    """并发检查一批账号，返回 用户名 -> True（有效）/ False（失效）/ None（出错）的字典，不写入账号仓库"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    bucket = make_bucket(max_rate, SWEEP_RATE_BURST)
+    results = {}
+
+    async def check(username):
+        async with semaphore:
+            await take_token(bucket)
+            results[username], _ = await run_with_deadline(check_cookie_async(username), f"检查 {username} 的 cookie")
+
+    await asyncio.gather(*(check(username) for username in usernames))
+    return results
+
+
+def apply_results(results, skipped=(), seconds=0.0):
+    """把检查结果一次性写入账号仓库并写盘，记录汇总日志，返回汇总字典"""
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    updates = {}
+    for username, valid in results.items():
+        if valid is True:
+            updates[username] = {"is_valid": True, "last_valid_time": now}
+        elif valid is False:
+            updates[username] = {"is_valid": False, "last_valid_time": ""}
+    account_store.update_many(updates)
+    account_store.flush()
+
+    summary = {
+        'checked': len(results),
+        'valid': sum(1 for valid in results.values() if valid is True),
+        'expired': sorted(username for username, valid in results.items() if valid is False),
+        'errors': sorted(username for username, valid in results.items() if valid is None),
+        'skipped': len(skipped),
+        'seconds': round(seconds, 2),
+    }
+    logger.info(f"cookie 检查完成，用时 {summary['seconds']} 秒：检查 {summary['checked']} 个账号，"
+                f"有效 {summary['valid']} 个，失效 {len(summary['expired'])} 个，出错 {len(summary['errors'])} 个，"
+                f"有效期内跳过 {summary['skipped']} 个")
+    if summary['expired']:
+        logger.info(f"需要重新登录的账号: {', '.join(summary['expired'])}")
+    if summary['errors']:
+        logger.info(f"检查出错、状态未变的账号: {', '.join(summary['errors'])}")
+    return summary
+
+
+def sweep(concurrency=SWEEP_CONCURRENCY, max_rate=SWEEP_MAX_RATE, force=False):
+    """检查所有账号并写回结果，阻塞到全部完成，返回汇总字典"""
+    to_check, skipped = select_accounts(force)
+    logger.info(f"开始检查 {len(to_check)} 个账号的 cookie，同时检查 {concurrency} 个，每秒最多 {max_rate or '不限'} 个")
+    started = time.monotonic()
+    results = engine.run_sync(sweep_async(to_check, concurrency, max_rate))
+    return apply_results(results, skipped, time.monotonic() - started)
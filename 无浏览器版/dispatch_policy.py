@@ -0,0 +1,94 @@
+import time
+import zlib
+import asyncio
+from log_config import setup_logger
+from resilience import TASK_DEADLINE
+from metrics import OUTCOME_OK, OUTCOME_TIMEOUT, OUTCOME_ERROR
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+MAX_TASK_RATE = 2.0         # 同一主机每秒最多启动的任务数
+TASK_RATE_BURST = 4         # 令牌桶容量，允许短时间内连续启动的任务数
+SIGN_JITTER = 300           # 1 点开放签到后，各账号签到时间分散到的秒数范围
+
+# 任务优先级，数值越小越先执行：签到每天只有一次机会，优先于打工
+TASK_PRIORITIES = {'sign': 0, 'work': 1}
+DEFAULT_PRIORITY = 5
+
+
+class TokenBucket:
+    """
+    令牌桶：按固定速率补充令牌，每启动一个任务消耗一个令牌。
+    本身不加锁，由调用方保证同一时间只有一个线程使用。
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def try_take(self, now=None):
+        """尝试取出一个令牌，成功返回 0，否则返回还需要等待的秒数"""
+        now = time.monotonic() if now is None else now
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+def make_bucket(rate, burst=TASK_RATE_BURST):
+    """速率为 0 或 None 时不限速，返回 None"""
+    if not rate:
+        return None
+    return TokenBucket(rate, max(1, burst))
+
+
+async def take_token(bucket):
+    """等到令牌桶中有令牌后取出一个，bucket 为 None（不限速）时直接返回"""
+    if bucket is None:
+        return
+    # 所有协程在同一个事件循环线程中取令牌，无需加锁
+    delay = bucket.try_take()
+    while delay > 0:
+        await asyncio.sleep(delay)
+        delay = bucket.try_take()
+
+
+async def run_with_deadline(coro, description, deadline=TASK_DEADLINE):
+    """
+    执行协程，超过 deadline 秒未完成时取消，超时和出错都只记录日志。
+    返回 (结果, 结局)，结局为 OUTCOME_OK / OUTCOME_TIMEOUT / OUTCOME_ERROR，超时或出错时结果为 None。
+    description 用于日志，例如“执行 xxx 的 sign 任务”。
+    """
+    try:
+        return await asyncio.wait_for(coro, deadline), OUTCOME_OK
+    except asyncio.TimeoutError:
+        logger.error(f"{description}超过 {deadline} 秒未完成，已取消")
+        return None, OUTCOME_TIMEOUT
+    except Exception as e:
+        logger.error(f"{description}时出错: {e}", exc_info=True)
+        return None, OUTCOME_ERROR
+
+
+def task_priority(task_type):
+    return TASK_PRIORITIES.get(task_type, DEFAULT_PRIORITY)
+
+
+def sign_jitter_offset(username, window):
+    """
+    按用户名计算账号在签到窗口内的固定偏移秒数。
+    同一账号每天的偏移相同，所有账号均匀分布在 [0, window) 内，完成时间可以预估。
+    """
+    if not window:
+        return 0.0
+    return zlib.crc32(username.encode('utf-8')) % 1000 / 1000 * window
+
+
+def estimate_drain_seconds(task_count, rate):
+    """按限速估算启动 task_count 个任务需要的秒数，不限速时返回 0"""
+    if not rate or task_count <= 0:
+        return 0.0
+    return task_count / rate
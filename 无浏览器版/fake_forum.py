@@ -0,0 +1,357 @@
+"""
+本地替身论坛服务器，用于离线测试和压测，不访问正式站。
+实现登录页（验证码图片、formhash、loginhash）、签到页及 qiandao 提交、
+打工页及 clickad 计数（1 - 6）、getcre 领取和冷却提示，可以配置延迟、错误率和限流。
+
+命令行运行:
+    python fake_forum.py --port 8080 --latency 0.05 --error-rate 0.01 --rate 50
+    TSDM_BASE_URL=http://127.0.0.1:8080 python -m tsdm_daemon --once
+
+进程内运行:
+    forum = FakeForum(latency=0.01)
+    forum_site.set_base_url(forum.start())
+    ...
+    forum.stop()
+
+账号不需要先登录：make_account(username) 生成的 cookie 会被视为已登录，
+也可以用任意用户名、FakeForum.password 和 FakeForum.verify_code 走一遍登录流程。
+GET /_stats 返回请求数、响应字节数等统计，带 reset=1 时读取后清零。
+"""
+import sys
+import time
+import zlib
+import random
+import struct
+import asyncio
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from aiohttp import web
+from dispatch_policy import make_bucket
+from log_config import setup_logger
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+AUTH_COOKIE = 's_gkr8_682f_auth'
+LASTACT_COOKIE = 's_gkr8_682f_lastact'
+SALTKEY_COOKIE = 's_gkr8_682f_saltkey'
+VERIFY_CODE = '8888'            # 验证码图片对应的答案
+PASSWORD = 'password'           # 登录密码，为空时接受任意密码
+AD_CLICKS = 6                   # 点多少次广告后可以领取奖励
+WORK_COOL_DOWN = 6 * 3600       # 打工冷却秒数
+PAGE_PADDING = 32 * 1024        # 页面正文前填充的字节数，模拟正式站页面的头部和导航
+
+SIGN_LOGIN_REQUIRED = "您需要先登录才能继续本操作"
+SIGNED_TEXT = "您今天已经签到过了或者签到时间还未开始"
+WORK_LOGIN_REQUIRED = "请先登录再进行点击任务"
+WORK_SUCCESS_TEXT = '恭喜，您已经成功领取了奖励天使币'
+FORMHASH_MISMATCH = '您的请求来路不正确或表单验证串不符，无法提交'
+
+
+def auth_token(username):
+    """auth cookie 中直接带上用户名，服务器重启后仍能识别"""
+    return 'fake-' + username.encode('utf-8').hex()
+
+
+def make_account(username):
+    """生成可以直接写入 login_info.json 的已登录账号"""
+    return {
+        "username": username,
+        "password": "",
+        "is_valid": True,
+        "last_sign_date": "",
+        "last_work_time": "",
+        "cookies": [
+            {"name": AUTH_COOKIE, "value": auth_token(username)},
+            {"name": SALTKEY_COOKIE, "value": "fakesalt"},
+            {"name": LASTACT_COOKIE, "value": f"{int(time.time())}%09plugin.php%09"},
+        ]
+    }
+
+
+def _formhash(username):
+    return hashlib.md5(f"formhash:{username}".encode('utf-8')).hexdigest()[:8]
+
+
+def _captcha_png(width=60, height=20):
+    """生成一张灰色的 PNG 验证码图片"""
+    raw = b''.join(b'\x00' + bytes([200]) * width for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b'')
+
+
+def _page(title, body, padding):
+    filler = '<div class="nav">' + ('<a href="forum.php">导航</a>' * (padding // 30)) + '</div>' if padding else ''
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title} - 天使动漫论坛</title></head>'
+            f'<body>{filler}<div id="wp">{body}</div></body></html>')
+
+
+def _ajax(message):
+    return f'<?xml version="1.0" encoding="utf-8"?>\n<root><![CDATA[<div class="c">{message}</div>]]></root>'
+
+
+class FakeForum:
+    """
+    替身论坛：latency 为每个请求的固定延迟秒数，jitter 为额外的随机延迟上限，
+    error_rate 为返回 503 的比例，rate 为每秒最多处理的请求数，超出时返回 429（0 表示不限流）。
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, rate=0,
+                 burst=None, verify_code=VERIFY_CODE, password=PASSWORD,
+                 work_cool_down=WORK_COOL_DOWN, page_padding=PAGE_PADDING):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.verify_code = verify_code
+        self.password = password
+        self.work_cool_down = work_cool_down
+        self.page_padding = page_padding
+        self._bucket = make_bucket(rate, burst or max(1, int(rate)))
+        self._tokens = {}               # 登录后发放的 auth cookie -> 用户名
+        self._users = {}                # 用户名 -> {'sign_date', 'clicks', 'work_until'}
+        self._lock = threading.Lock()   # 保护统计数据，供其他线程读取
+        self._stats = Counter()
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self.base_url = None
+
+    def stats(self):
+        """返回请求统计：总请求数、响应字节数、各状态码和各操作的请求数"""
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+    def reset_accounts(self):
+        """清空签到、打工状态，下一轮请求重新开始"""
+        self._users.clear()
+
+    def make_app(self):
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_route('*', '/member.php', self.member)
+        app.router.add_route('*', '/plugin.php', self.plugin)
+        app.router.add_get('/_stats', self.stats_view)
+        return app
+
+    def start(self):
+        """在后台线程启动服务器，返回论坛地址"""
+        started = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._start_site())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name='fake_forum', daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.base_url
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    async def _start_site(self):
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]
+        self.base_url = f"http://{self.host}:{self.port}"
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        if request.path.startswith('/_'):
+            # 管理接口不计入统计，也不受延迟、错误率和限流影响
+            return await handler(request)
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self._bucket is not None and self._bucket.try_take() > 0:
+            response = web.Response(status=429, text='Too Many Requests')
+        elif self.error_rate and random.random() < self.error_rate:
+            response = web.Response(status=503, text='Service Unavailable')
+        else:
+            response = await handler(request)
+        with self._lock:
+            self._stats['requests'] += 1
+            self._stats['bytes'] += len(response.body or b'')
+            self._stats[f'status_{response.status}'] += 1
+        return response
+
+    async def stats_view(self, request):
+        """以 JSON 返回请求统计，带 reset=1 时读取后清零，供在其他进程中运行的压测读取"""
+        stats = self.stats()
+        if request.query.get('reset') == '1':
+            self.reset_stats()
+        return web.json_response(stats)
+
+    def _count(self, action):
+        with self._lock:
+            self._stats[action] += 1
+
+    def _user(self, request):
+        """按 auth cookie 找到已登录的用户名，未登录时返回 None"""
+        token = request.cookies.get(AUTH_COOKIE)
+        if not token:
+            return None
+        username = self._tokens.get(token)
+        if username is None and token.startswith('fake-'):
+            # make_account 生成的账号没有走登录流程，从 cookie 中读出用户名
+            try:
+                username = self._tokens.setdefault(token, bytes.fromhex(token[5:]).decode('utf-8'))
+            except ValueError:
+                return None
+        if username is not None and username not in self._users:
+            self._users[username] = {'sign_date': None, 'clicks': 0, 'work_until': 0.0}
+        return username
+
+    def _html(self, title, body):
+        response = web.Response(text=_page(title, body, self.page_padding), content_type='text/html')
+        response.set_cookie(LASTACT_COOKIE, f"{int(time.time())}%09plugin.php%09")
+        return response
+
+    async def member(self, request):
+        if request.query.get('mod') != 'logging':
+            raise web.HTTPNotFound()
+        if request.method == 'GET':
+            self._count('login_page')
+            loginhash = hashlib.md5(str(random.random()).encode()).hexdigest()[:5]
+            body = (f'<div id="main_messaqge_{loginhash}"><form method="post">'
+                    f'<input type="hidden" name="formhash" value="{_formhash("guest")}" />'
+                    f'<img src="plugin.php?id=oracle:verify&amp;update={random.random():.6f}" class="tsdm_verify" />'
+                    '</form></div>')
+            return self._html('登录', body)
+        self._count('login')
+        form = await request.post()
+        username = form.get('username', '')
+        if (form.get('formhash') != _formhash('guest') or not username
+                or form.get('tsdm_verify') != self.verify_code
+                or (self.password and form.get('password') != self.password)):
+            return web.Response(text=_ajax('登录失败，您还可以尝试 4 次'), content_type='text/xml')
+        token = auth_token(username)
+        self._tokens[token] = username
+        response = web.Response(text=_ajax(f'欢迎您回来，{username}'), content_type='text/xml')
+        response.set_cookie(AUTH_COOKIE, token)
+        response.set_cookie(SALTKEY_COOKIE, 'fakesalt')
+        response.set_cookie(LASTACT_COOKIE, f"{int(time.time())}%09member.php%09")
+        return response
+
+    async def plugin(self, request):
+        plugin_id = request.query.get('id')
+        if plugin_id == 'oracle:verify':
+            self._count('captcha')
+            return web.Response(body=_captcha_png(), content_type='image/png')
+        if plugin_id == 'dsu_paulsign:sign':
+            if request.query.get('operation') == 'qiandao':
+                return await self.sign(request)
+            return self.sign_page(request)
+        if plugin_id == 'np_cliworkdz:work':
+            if request.method == 'POST':
+                return await self.work_action(request)
+            return self.work_page(request)
+        raise web.HTTPNotFound()
+
+    def sign_page(self, request):
+        self._count('sign_page')
+        username = self._user(request)
+        if username is None:
+            return self._html('提示信息', f'<div class="alert_error"><p>{SIGN_LOGIN_REQUIRED}</p></div>')
+        space_link = f'<a href="home.php?mod=space" title="访问我的空间">{username}</a>'
+        if self._users[username]['sign_date'] == date.today():
+            return self._html('每日签到', f'{space_link}<h1 class="mt">{SIGNED_TEXT}</h1>')
+        body = (f'{space_link}<form id="qiandao" method="post" action="plugin.php?id=dsu_paulsign:sign&amp;operation=qiandao">'
+                f'<input type="hidden" name="formhash" value="{_formhash(username)}">'
+                '<input id="kx" type="radio" name="qdxq" value="kx"></form>')
+        return self._html('每日签到', body)
+
+    async def sign(self, request):
+        self._count('qiandao')
+        username = self._user(request)
+        form = await request.post()
+        if username is None:
+            message = SIGN_LOGIN_REQUIRED
+        elif form.get('formhash') != _formhash(username):
+            message = FORMHASH_MISMATCH
+        elif self._users[username]['sign_date'] == date.today():
+            message = '您今日已经签到，请明天再来！'
+        else:
+            self._users[username]['sign_date'] = date.today()
+            message = '恭喜你签到成功!获得随机奖励 天使币 3 .'
+        return web.Response(text=_ajax(message), content_type='text/xml')
+
+    def work_page(self, request):
+        self._count('work_page')
+        username = self._user(request)
+        if username is None:
+            return self._html('打工', f'<div id="messagetext"><p>{WORK_LOGIN_REQUIRED}</p></div>')
+        remaining = self._users[username]['work_until'] - time.time()
+        if remaining > 0:
+            wait = timedelta(seconds=int(remaining))
+            hours, rest = divmod(wait.seconds, 3600)
+            message = f"您需要等待{hours}小时{rest // 60}分钟{rest % 60}秒后即可进行。"
+            return self._html('打工', f'<div id="messagetext"><p>{message}</p></div>')
+        ads = ''.join(f'<a href="javascript:;" onclick="clickad({i})">广告 {i}</a>' for i in range(1, AD_CLICKS + 1))
+        return self._html('打工', f'<div id="advids">{ads}</div><button id="stopad">领取奖励</button>')
+
+    async def work_action(self, request):
+        username = self._user(request)
+        form = await request.post()
+        act = form.get('act')
+        self._count(act or 'work_unknown')
+        if username is None:
+            return web.Response(text=WORK_LOGIN_REQUIRED)
+        user = self._users[username]
+        if user['work_until'] > time.time():
+            return web.Response(text='0')
+        if act == 'clickad':
+            user['clicks'] = min(AD_CLICKS, user['clicks'] + 1)
+            return web.Response(text=str(user['clicks']))
+        if act == 'getcre':
+            if user['clicks'] < AD_CLICKS:
+                return web.Response(text='请先完成广告点击任务')
+            user['clicks'] = 0
+            user['work_until'] = time.time() + self.work_cool_down
+            return web.Response(text=f'{WORK_SUCCESS_TEXT} 20 枚')
+        return web.Response(text='未知操作')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='fake_forum', description='本地替身论坛服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的固定延迟秒数')
+    parser.add_argument('--jitter', type=float, default=0.0, help='每个请求额外随机延迟的上限秒数')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 503 的请求比例')
+    parser.add_argument('--rate', type=float, default=0, help='每秒最多处理的请求数，超出返回 429，0 表示不限流')
+    parser.add_argument('--work-cool-down', type=float, default=WORK_COOL_DOWN, help='打工冷却秒数')
+    parser.add_argument('--page-padding', type=int, default=PAGE_PADDING, help='页面正文前填充的字节数')
+    args = parser.parse_args(argv)
+
+    forum = FakeForum(args.host, args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      rate=args.rate, work_cool_down=args.work_cool_down, page_padding=args.page_padding)
+    print(f"替身论坛已启动: http://{args.host}:{args.port}，验证码 {forum.verify_code}，密码 {forum.password}")
+    print(f"设置环境变量 TSDM_BASE_URL=http://{args.host}:{args.port} 后运行签到工具即可访问替身论坛")
+    web.run_app(forum.make_app(), host=args.host, port=args.port, print=None, access_log=None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+论坛地址：默认访问天使动漫正式站。
+设置环境变量 TSDM_BASE_URL，或在发出请求前调用 set_base_url，可以改为访问本地替身服务器（见 fake_forum.py）。
+"""
+import os
+from urllib.parse import urlsplit
+from log_config import setup_logger
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+DEFAULT_BASE_URL = 'https://www.tsdm39.com'
+BASE_URL_ENV = 'TSDM_BASE_URL'
+
+_base_url = (os.environ.get(BASE_URL_ENV) or DEFAULT_BASE_URL).rstrip('/')
+_listeners = []
+
+
+def base_url():
+    """当前论坛地址，不带结尾的 /"""
+    return _base_url
+
+
+def url(path):
+    """拼接论坛页面地址，path 为 member.php?... 这样的相对路径"""
+    return f"{_base_url}/{path.lstrip('/')}"
+
+
+def host():
+    """论坛主机名，用于按主机限速和熔断"""
+    return urlsplit(_base_url).hostname
+
+
+def netloc():
+    """Host 请求头的值，非默认端口时带端口号"""
+    return urlsplit(_base_url).netloc
+
+
+def add_listener(callback):
+    """论坛地址变化时调用 callback()，用于重新生成各模块中的地址和请求头"""
+    _listeners.append(callback)
+    callback()
+
+
+def set_base_url(new_base_url):
+    global _base_url
+    _base_url = (new_base_url or DEFAULT_BASE_URL).rstrip('/')
+    if _base_url != DEFAULT_BASE_URL:
+        logger.info(f"论坛地址已改为 {_base_url}")
+    for callback in _listeners:
+        callback()
@@ -2,6 +2,63 @@
 import os
 import sys
 import logging
+from collections import deque
+
+RING_BUFFER_CAPACITY = 5000  # 内存中保留的未读日志行数上限
+LOG_FILE_ENV = 'TSDM_LOG_FILE'  # 覆盖日志文件路径的环境变量
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    把格式化后的日志行放入有界的内存环形缓冲区，由界面按批次取走显示，
+    超出容量时丢弃最旧的行，长期运行内存占用不会增长。
+    """
+
+    def __init__(self, capacity=RING_BUFFER_CAPACITY):
+        super().__init__()
+        self._lines = deque(maxlen=capacity)
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        # Handler.handle 调用 emit 时已持有 self.lock
+        self._lines.append(line)
+
+    def drain(self):
+        """取走缓冲区中所有未读的日志行"""
+        self.acquire()
+        try:
+            lines = list(self._lines)
+            self._lines.clear()
+        finally:
+            self.release()
+        return lines
+
+
+def get_ring_buffer_handler(logger):
+    for handler in logger.handlers:
+        if isinstance(handler, RingBufferHandler):
+            return handler
+    return None
+
+
+def attach_ring_buffer_handler(logger):
+    """
+    给日志记录器挂上环形缓冲区处理器，供界面显示日志使用，已经挂上时直接返回。
+    只由界面调用，守护进程等没有读取方的场合不保留日志行。
+    """
+    handler = get_ring_buffer_handler(logger)
+    if handler is None:
+        handler = RingBufferHandler()
+        # 与 setup_logger 添加的处理器使用同样的格式
+        if logger.handlers:
+            handler.setFormatter(logger.handlers[0].formatter)
+        logger.addHandler(handler)
+    return handler
+
 
 def setup_logger(log_file_name):
     # 判断程序是否被打包
@@ -11,8 +68,8 @@ def setup_logger(log_file_name):
     else:
         # 如果是未打包的程序，使用当前脚本所在目录
         base_path = os.path.dirname(os.path.abspath(__file__))
-    # 构建日志文件的完整路径
-    log_file_path = os.path.join(base_path, log_file_name)
+    # 构建日志文件的完整路径，设置了环境变量 TSDM_LOG_FILE 时改为写入该文件（基准测试等不写入正式日志）
+    log_file_path = os.environ.get(LOG_FILE_ENV) or os.path.join(base_path, log_file_name)
     # 创建日志记录器，使用固定名称避免不同模块获取不同实例
     logger = logging.getLogger('tsdm_sign_logger')
     # 禁用日志传播
@@ -1,81 +1,55 @@
-import io
 import os
 import sys
+import math
 import time
 import winreg
-import requests
 import multiprocessing
-from datetime import datetime, timedelta
-from log_config import setup_logger
-from tsdm_sign_check_action import perform_sign
-from tsdm_work_check_action import perform_work
-from config_handler import load_config, save_config, update_account_info
+from collections import deque
+from datetime import datetime
+from log_config import setup_logger, get_ring_buffer_handler, attach_ring_buffer_handler
+from async_engine import engine, perform_sign_async, perform_work_async
+from account_store import account_store
 from tsdm_login_part import LoginWindow
+from session_manager import create_session
+from cookie_jar import drop_jar
+from account_table import (AccountTableModel, ButtonDelegate, SIGN_STATUS_COLUMN, SIGN_BUTTON_COLUMN,
+                           WORK_BUTTON_COLUMN, RE_LOGIN_BUTTON_COLUMN, DELETE_BUTTON_COLUMN)
+from scheduler import DeadlineScheduler
+from task_executor import TaskExecutor, MAX_WORKERS, MAX_PER_HOST
+from dispatch_policy import MAX_TASK_RATE, SIGN_JITTER
+from concurrency_controller import concurrency_controller
+import metrics
+import cookie_sweep
 from PyQt5.QtGui import QPainter, QBrush, QColor, QFont, QIcon
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-                             QPushButton, QFrame, QTextEdit, QMessageBox, QTableWidget,
-                             QTableWidgetItem, QSystemTrayIcon, QMenu, QAction)
-from PyQt5.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve, QPointF, pyqtSignal, QRectF, QThread, pyqtProperty  # 导入 pyqtProperty
+                             QPushButton, QFrame, QPlainTextEdit, QMessageBox, QTableView,
+                             QAbstractItemView, QSystemTrayIcon, QMenu, QAction)
+from PyQt5.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve, QPointF, pyqtSignal, QRectF, QObject, pyqtProperty  # 导入 pyqtProperty
 
 # 配置日志
 logger = setup_logger('tsdm_sign_tools.log')
 
-LOGIN_URL = 'https://www.tsdm39.com/member.php?mod=logging&action=login'
+LOG_EMITS_PER_SECOND = 4  # 日志面板每秒最多刷新的次数
+LOG_MAX_BLOCKS = 2000     # 日志面板最多保留的行数，超出后自动丢弃最旧的行
+LOG_FRAME_INTERVAL = 16   # 日志追加合并的帧间隔（毫秒）
 
-class LogReaderThread(QThread): # 日志读取线程类
-    new_log_signal = pyqtSignal(str)  # 定义信号，用于发送新的日志内容
+MAX_SCHEDULER_WAIT = 3600  # 调度定时器单次最长等待秒数，防止系统休眠或改时间后错过截止时间
 
-    def __init__(self, log_file_path, last_log_size):
-        super().__init__()
-        self.log_file_path = log_file_path
-        self.last_log_size = last_log_size
-
-    def run(self):
-        if os.path.exists(self.log_file_path):
-            try:
-                with io.open(self.log_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    f.seek(0, os.SEEK_END)
-                    current_size = f.tell()
-                    if current_size > self.last_log_size:
-                        f.seek(self.last_log_size)
-                        new_log_content = ''.join([line.strip() + '\n' for line in f.readlines()])
-                        self.new_log_signal.emit(new_log_content)  # 发送新日志内容
-                        self.last_log_size = current_size
-            except Exception as e:
-                # 这里可以记录异常日志
-                pass
-
-class SignThread(QThread): # 签到线程类
-    # 定义信号，任务完成时发出
-    finished = pyqtSignal(str)
-
-    def __init__(self, username):
-        super().__init__()
-        self.username = username
-
-    def run(self):
-        try:
-            perform_sign(self.username)
-            self.finished.emit(self.username)
-        except Exception as e:
-            # 可以在这里添加错误处理的日志
-            pass
+class LogEmitter(QObject): # 日志信号类
+    new_log_signal = pyqtSignal(str)  # 定义信号，用于批量发送新的日志内容
 
-class WorkThread(QThread): # 工作线程类
-    # 定义信号，任务完成时发出
-    finished = pyqtSignal(str)
+    def __init__(self, ring_buffer_handler, emits_per_second=LOG_EMITS_PER_SECOND, parent=None):
+        super().__init__(parent)
+        self.ring_buffer_handler = ring_buffer_handler
+        # 定时从内存环形缓冲区取走新日志，每秒最多发出 emits_per_second 次信号
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.emit_pending)
+        self.timer.start(1000 // emits_per_second)
 
-    def __init__(self, username):
-        super().__init__()
-        self.username = username
-
-    def run(self):
-        try:
-            perform_work(self.username)
-            self.finished.emit(self.username)
-        except Exception as e:
-            # 可以在这里添加错误处理的日志
-            pass
+    def emit_pending(self):
+        lines = self.ring_buffer_handler.drain()
+        if lines:
+            self.new_log_signal.emit('\n'.join(lines) + '\n')
 
 class ToggleSwitch(QWidget): # 自定义开关类
     def __init__(self, parent=None, width=150, height=30, checked_color="#66BB6A",
@@ -156,6 +130,11 @@ class ToggleSwitch(QWidget): # 自定义开关类
         painter.drawText(int(text_x), int(text_y), text)
 
 class LoginTool(QWidget): # 登录工具面板类
+    # 任务执行完成信号，从工作线程发出，在界面线程处理
+    task_finished = pyqtSignal(str, str)
+    # cookie 批量检查完成信号，参数为事件循环返回的 Future
+    sweep_finished = pyqtSignal(object)
+
     def __init__(self):
         super().__init__()
         self._init_config()
@@ -165,10 +144,7 @@ class LoginTool(QWidget): # 登录工具面板类
         self._init_ui()
         self.logged_accounts = {}
         self.is_automation_running = False
-        self.task_queue = []  # 任务队列
-        self.is_task_running = False  # 任务锁
-        self.log_reader_thread = None  # 日志读取线程
-        self.current_task_index = -1  # 新增：当前任务的索引
+        self._init_executor()
         self.load_and_refresh() # 初始化开机启动开关按钮
         self.init_tray_icon()   # 初始化系统托盘
         self.registry_queue = None
@@ -226,6 +202,8 @@ class LoginTool(QWidget): # 登录工具面板类
 
     def quit_app(self): # 退出程序
         self.tray_icon.hide()
+        self.task_executor.shutdown()
+        account_store.flush()
         QApplication.quit()
 
     def closeEvent(self, event):
@@ -263,12 +241,7 @@ class LoginTool(QWidget): # 登录工具面板类
             # 如果是未打包的程序
             base_path = os.path.dirname(os.path.abspath(__file__))
         self.log_file_path = os.path.join(base_path, 'tsdm_sign_tools.log')
-        self.last_log_size = 0  # 新增属性，记录上一次读取的文件大小
-        self.config = load_config()
-
-        # 确保从正确的字段获取账号列表
-        accounts = self.config.get("accounts", [])
-        self.logged_accounts = {account["username"]: account for account in accounts}
+        self.logged_accounts = account_store.all_accounts()
         self.current_time = datetime.now()
 
     def _init_timers(self):
@@ -277,22 +250,59 @@ class LoginTool(QWidget): # 登录工具面板类
         self.time_update_timer.timeout.connect(self.update_all_time_dependent_info)
         self.time_update_timer.start(1000)
 
-        # 日志定时器
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_log_display)
-        self.timer.start(1000)
-
-    def start_log_reader(self):
-        if self.log_reader_thread and self.log_reader_thread.isRunning():
+        # 调度定时器：单次触发，睡眠到最早的签到/打工截止时间再唤醒
+        self.scheduler = DeadlineScheduler(sign_jitter=account_store.get_setting("sign_jitter", SIGN_JITTER))
+        self.scheduler_timer = QTimer(self)
+        self.scheduler_timer.setSingleShot(True)
+        self.scheduler_timer.setTimerType(Qt.PreciseTimer)
+        self.scheduler_timer.timeout.connect(self.run_due_tasks)
+
+        # 日志信号：日志记录进入内存环形缓冲区，按批次推送到界面，不再轮询读取日志文件
+        self.log_emitter = LogEmitter(attach_ring_buffer_handler(logger), parent=self)
+        self.log_emitter.new_log_signal.connect(self.update_log_display_ui)
+
+    def _init_executor(self):
+        # 并发数可在配置文件中通过 max_workers / max_per_host 调整，启动速率通过 max_task_rate 调整
+        # 签到/打工协程在异步引擎的事件循环中交错执行，共享同一个连接池
+        self.task_executor = TaskExecutor(
+            {'sign': perform_sign_async, 'work': perform_work_async},
+            max_workers=account_store.get_setting("max_workers", MAX_WORKERS),
+            max_per_host=account_store.get_setting("max_per_host", MAX_PER_HOST),
+            on_finished=self.task_finished.emit,
+            loop=engine.get_loop(),
+            max_rate=account_store.get_setting("max_task_rate", MAX_TASK_RATE),
+            controller=concurrency_controller
+        )
+        self.task_finished.connect(self.on_task_finished)
+        self.sweep_finished.connect(self.on_sweep_finished)
+        # 配置了 metrics_port 时在本机提供 Prometheus 格式的耗时统计
+        metrics_port = account_store.get_setting("metrics_port")
+        if metrics_port:
+            try:
+                metrics.start_http_server(metrics_port)
+            except OSError as e:
+                logger.error(f"启动指标服务失败: {e}")
+
+    def update_log_display_ui(self, new_log_content): # 更新日志显示
+        self.pending_log_lines.extend(new_log_content.rstrip('\n').split('\n'))
+        # 窗口隐藏在托盘时不追加也不滚动，等窗口重新显示时一次性补上
+        if self.isVisible() and not self.log_flush_timer.isActive():
+            self.log_flush_timer.start(LOG_FRAME_INTERVAL)
+
+    def flush_log_lines(self):
+        """把一帧内累积的日志行一次性追加到面板"""
+        if not self.pending_log_lines:
             return
-        self.log_reader_thread = LogReaderThread(self.log_file_path, self.last_log_size)
-        self.log_reader_thread.new_log_signal.connect(self.update_log_display_ui)
-        self.log_reader_thread.start()
+        scroll_bar = self.log_text_edit.verticalScrollBar()
+        at_bottom = scroll_bar.value() == scroll_bar.maximum()
+        self.log_text_edit.appendPlainText('\n'.join(self.pending_log_lines))
+        self.pending_log_lines.clear()
+        if at_bottom:
+            scroll_bar.setValue(scroll_bar.maximum())
 
-    def update_log_display_ui(self, new_log_content):
-        self.log_text_edit.insertPlainText(new_log_content)
-        self.last_log_size += len(new_log_content.encode('utf-8'))
-        self.log_text_edit.moveCursor(self.log_text_edit.textCursor().End)
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.flush_log_lines()
 
     def _init_ui(self):
         self.setWindowTitle("天使动漫论坛登录工具")
@@ -302,9 +312,16 @@ class LoginTool(QWidget): # 登录工具面板类
         # main_layout.addWidget(self.add_account_button)
         self.user_table = self._create_user_table()
         main_layout.addWidget(self.user_table)
-        self.log_text_edit = QTextEdit()
+        self.log_text_edit = QPlainTextEdit()
         self.log_text_edit.setReadOnly(True)
+        self.log_text_edit.setUndoRedoEnabled(False)
+        self.log_text_edit.setMaximumBlockCount(LOG_MAX_BLOCKS)
         main_layout.addWidget(self.log_text_edit)
+        # 等待追加到日志面板的行，窗口隐藏在托盘时也只保留最近 LOG_MAX_BLOCKS 行
+        self.pending_log_lines = deque(maxlen=LOG_MAX_BLOCKS)
+        self.log_flush_timer = QTimer(self)
+        self.log_flush_timer.setSingleShot(True)
+        self.log_flush_timer.timeout.connect(self.flush_log_lines)
 
         # 假设 toggle_switch 在 _create_browser_info_frame 方法中创建
         browser_info_frame = self._create_browser_info_frame()
@@ -340,9 +357,16 @@ class LoginTool(QWidget): # 登录工具面板类
 
     # UI 创建工具方法
     def _create_user_table(self):
-        table = QTableWidget()
-        table.setColumnCount(8)
-        table.setHorizontalHeaderLabels(["用户", "cookie状态", "签到情况", "打工冷却", "", "功", "能", ""])
+        table = QTableView()
+        self.account_model = AccountTableModel(self)
+        table.setModel(self.account_model)
+        # 按钮列由委托绘制，不再为每个账号创建 QPushButton
+        self.button_delegate = ButtonDelegate(table)
+        self.button_delegate.clicked.connect(self.on_table_button_clicked)
+        for column in (SIGN_BUTTON_COLUMN, WORK_BUTTON_COLUMN, RE_LOGIN_BUTTON_COLUMN, DELETE_BUTTON_COLUMN):
+            table.setItemDelegateForColumn(column, self.button_delegate)
+        # 行高固定，大量账号时视图无需逐行计算高度
+        table.verticalHeader().setDefaultSectionSize(30)
         # 隐藏表格线
         table.setShowGrid(False)
         table.horizontalHeader().setStretchLastSection(True)
@@ -351,8 +375,8 @@ class LoginTool(QWidget): # 登录工具面板类
         for col, width in enumerate(column_widths):
             table.setColumnWidth(col, width)
         # 设置选择行为为无选择，禁止选中表格项
-        table.setSelectionMode(QTableWidget.NoSelection)
-        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.setSelectionMode(QAbstractItemView.NoSelection)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
 
         return table
 
@@ -388,6 +412,10 @@ class LoginTool(QWidget): # 登录工具面板类
         clear_log_button.clicked.connect(self.clear_log)
         second_row_layout.addWidget(clear_log_button)
 
+        self.sweep_button = QPushButton("检查登录状态")
+        self.sweep_button.clicked.connect(self.start_cookie_sweep)
+        second_row_layout.addWidget(self.sweep_button)
+
         self.clock_label = QLabel()
         self.clock_label.setAlignment(Qt.AlignCenter)
         self.clock_label.setStyleSheet("font-size: 18px;")
@@ -395,30 +423,29 @@ class LoginTool(QWidget): # 登录工具面板类
 
         outer_layout.addLayout(second_row_layout)
 
+        # 并发状态：当前并发数、最近窗口的平均延迟和错误率、任务队列长度
+        self.concurrency_label = QLabel()
+        self.concurrency_label.setAlignment(Qt.AlignCenter)
+        outer_layout.addWidget(self.concurrency_label)
+
         return frame
 
     def load_and_refresh(self):
         """加载配置文件并刷新面板显示"""
         self.load_configuration()
         self.display_logged_accounts()
+        # 只为新增或状态变化的账号重新计算截止时间
+        self.scheduler.sync_accounts(self.logged_accounts)
 
         # 检查开关状态并触发自动功能
         if self.toggle_switch.checked:
             self.is_automation_running = True
-            # 触发一次任务检查，确保自动任务开始执行
-            self.update_all_time_dependent_info()
+            # 处理一次到期任务，并设置下次唤醒时间
+            self.run_due_tasks()
 
     def load_configuration(self):
-        self.config = load_config()
-
-        # 确保 self.config 是字典
-        if isinstance(self.config, list):
-            new_config = {
-                "accounts": self.config,
-                "toggle_switch_state": False
-            }
-            self.config = new_config
-        self.logged_accounts = {account["username"]: account for account in self.config.get("accounts", [])}
+        # 账号信息直接取自内存中的账号仓库，不再每次重新读取配置文件
+        self.logged_accounts = account_store.all_accounts()
     
         # 检查是否有账号信息，若没有则强制关闭开关
         if not self.logged_accounts:
@@ -427,7 +454,7 @@ class LoginTool(QWidget): # 登录工具面板类
             self.toggle_switch.update()
         else:
             # 有账号信息时正常加载开关状态
-            self.toggle_switch.checked = self.config.get("toggle_switch_state", False)
+            self.toggle_switch.checked = account_store.get_setting("toggle_switch_state", False)
             if self.toggle_switch.checked:
                 self.toggle_switch._offset = self.toggle_switch.width() - self.toggle_switch.height()
                 self.toggle_switch.update()
@@ -447,13 +474,17 @@ class LoginTool(QWidget): # 登录工具面板类
             if self.toggle_switch.checked:
                 logger.info("自动功能已开启")
                 self.is_automation_running = True
+                # 关闭期间已到期的任务被丢弃过，重新计算所有账号的截止时间
+                self.scheduler = DeadlineScheduler(sign_jitter=account_store.get_setting("sign_jitter", SIGN_JITTER))
+                self.scheduler.sync_accounts(self.logged_accounts)
+                self.run_due_tasks()
             else:
                 logger.info("自动功能已关闭")
                 self.is_automation_running = False
+                self.scheduler_timer.stop()
 
         # 保存滑动开关状态
-        self.config["toggle_switch_state"] = self.toggle_switch.checked
-        save_config(self.config)
+        account_store.set_setting("toggle_switch_state", self.toggle_switch.checked)
 
     def update_driver(self):
         self.update_driver_thread.result_signal.connect(self.handle_update_result)
@@ -470,106 +501,88 @@ class LoginTool(QWidget): # 登录工具面板类
             QMessageBox.critical(self, "更新失败", "浏览器驱动更新失败，请查看日志。")
 
     def show_login_browser(self):
-        session = requests.Session()
+        session = create_session()
         # 将 session 传递给 AddAccountThread
-        login_window = LoginWindow(session)
+        self._show_login_window(LoginWindow(session))
+
+    def _show_login_window(self, login_window):
+        # 保留窗口引用，登录成功后重新加载账号列表
+        self.login_window = login_window
+        login_window.login_succeeded.connect(lambda username: self.load_and_refresh())
         login_window.show()
 
     def delete_account(self, username):
         if username in self.logged_accounts:
-            del self.logged_accounts[username]
-            self.save_config_changes()
+            # 已删除的账号不再执行等待中的任务
+            for task_type in ('sign', 'work'):
+                self.task_executor.cancel(task_type, username)
+            account_store.remove(username)
+            account_store.flush()
+            drop_jar(username)
             self.load_and_refresh()
             logger.info(f"账号 {username} 已删除")
 
-    def start_sign_for_user(self, username, callback=None):
-        self.sign_thread = SignThread(username)
-        if callback:
-            self.sign_thread.finished.connect(lambda: (callback(), self.load_and_refresh()))
-        else:
-            self.sign_thread.finished.connect(self.load_and_refresh)
-        self.sign_thread.start()
-
-    def start_work_for_user(self, username, callback=None):
-        self.work_thread = WorkThread(username)
-        if callback:
-            self.work_thread.finished.connect(lambda: (callback(), self.load_and_refresh()))
-        else:
-            self.work_thread.finished.connect(self.load_and_refresh)
-        self.work_thread.start()
-
-
-    def task_complete(self):
-        self.is_task_running = False  # 任务完成，解锁
-        unique_tasks = []
-        seen = set()
-        for task in self.task_queue:
-            if task not in seen:
-                unique_tasks.append(task)
-                seen.add(task)
-        self.task_queue = unique_tasks
+    def on_task_finished(self, task_type, username):
+        """任务执行完成后重新计算该账号的截止时间，并只刷新该账号所在的行"""
+        self.reschedule_account(username)
+        self.account_model.refresh_account(username)
+        if self.is_automation_running:
+            self.run_due_tasks()
+
+    def on_table_button_clicked(self, row, column):
+        username = self.account_model.username_at(row)
+        if column == SIGN_BUTTON_COLUMN:
+            self.add_task_to_queue('sign', username)
+        elif column == WORK_BUTTON_COLUMN:
+            self.add_task_to_queue('work', username)
+        elif column == RE_LOGIN_BUTTON_COLUMN:
+            self.re_login(username)
+        elif column == DELETE_BUTTON_COLUMN:
+            self.delete_account(username)
+
+    def start_cookie_sweep(self):
+        """在后台事件循环中并发检查所有账号的 cookie，完成后在界面线程写回结果"""
+        to_check, skipped = cookie_sweep.select_accounts()
+        if not to_check:
+            cookie_sweep.apply_results({}, skipped)
+            return
+        concurrency = account_store.get_setting("sweep_concurrency", cookie_sweep.SWEEP_CONCURRENCY)
+        max_rate = account_store.get_setting("sweep_max_rate", cookie_sweep.SWEEP_MAX_RATE)
+        logger.info(f"开始检查 {len(to_check)} 个账号的 cookie")
+        self.sweep_button.setEnabled(False)
+        self.sweep_skipped = skipped
+        self.sweep_started = time.monotonic()
+        future = engine.submit(cookie_sweep.sweep_async(to_check, concurrency, max_rate))
+        future.add_done_callback(self.sweep_finished.emit)
+
+    def on_sweep_finished(self, future):
+        self.sweep_button.setEnabled(True)
+        try:
+            results = future.result()
+        except Exception as e:
+            logger.error(f"检查 cookie 时出错: {e}")
+            return
+        cookie_sweep.apply_results(results, self.sweep_skipped, time.monotonic() - self.sweep_started)
+        self.load_and_refresh()
 
     def clear_log(self):
         if os.path.exists(self.log_file_path):
             with open(self.log_file_path, 'w') as f:
                 f.truncate(0)
-            self.log_text_edit.clear()
-            # 重置 last_log_size 为 0
-            self.last_log_size = 0
+        # 丢弃尚未显示的日志并清空面板
+        get_ring_buffer_handler(logger).drain()
+        self.pending_log_lines.clear()
+        self.log_text_edit.clear()
 
     # 数据更新
     def display_logged_accounts(self):
-        self.user_table.setRowCount(0)
-        current_date = self.current_time.strftime("%Y-%m-%d") 
-        for row, (username, account_info) in enumerate(self.logged_accounts.items()):
-            self.user_table.insertRow(row)
-            # 用户
-            self.user_table.setItem(row, 0, QTableWidgetItem(username))
-
-            # cookie 状态
-            is_valid = account_info["is_valid"]
-            status_text = "有效" if is_valid else "过期"
-            self.user_table.setItem(row, 1, QTableWidgetItem(status_text))
-
-            # 签到情况
-            last_sign_date = account_info.get("last_sign_date", "")
-            sign_status = "今日已签到" if last_sign_date == current_date else "未签到"
-            self.user_table.setItem(row, 2, QTableWidgetItem(sign_status))
-
-            # 打工冷却
-            cool_down_text = self.calculate_work_cool_down(account_info)
-            self.user_table.setItem(row, 3, QTableWidgetItem(cool_down_text))
-
-            # 签到按钮
-            current_hour = self.current_time.hour
-            sign_button = QPushButton("签到")
-            sign_button.clicked.connect(lambda _, u=username: self.add_task_to_queue('sign', u))
-            sign_button.setEnabled(is_valid and not (0 <= current_hour < 1))
-            self.user_table.setCellWidget(row, 4, sign_button)
-
-            # 打工按钮
-            work_button = QPushButton("打工")
-            work_button.clicked.connect(lambda _, u=username: self.add_task_to_queue('work', u))
-            work_button.setEnabled(is_valid)
-            self.user_table.setCellWidget(row, 5, work_button)
-
-            # 重登按钮
-            re_login_button = QPushButton("重登")
-            re_login_button.clicked.connect(lambda _, u=username: self.re_login(u))
-            self.user_table.setCellWidget(row, 6, re_login_button)
-
-            # 删除按钮
-            delete_button = QPushButton("删除")
-            delete_button.clicked.connect(lambda _, u=username: self.delete_account(u))
-            self.user_table.setCellWidget(row, 7, delete_button)
+        # 账号列表不变时只通知视图刷新可见行，不再重建控件
+        self.account_model.set_current_time(self.current_time)
+        self.account_model.set_accounts(self.logged_accounts)
 
     def add_task_to_queue(self, task_type, username):
-        task = (task_type, username)
-        if task not in self.task_queue:
-            logger.info(f"添加 {username} 的 {task_type} 任务")
-            self.task_queue.append(task)
-            logger.info(f"更新任务队列: {self.task_queue}")
-            self.execute_task_if_available()
+        self.task_executor.submit(task_type, username)
+
     def update_all_time_dependent_info(self):
         # 每秒获取一次当前时间
         current_time = datetime.now()
@@ -578,134 +591,50 @@ class LoginTool(QWidget): # 登录工具面板类
 
         # 更新时钟显示
         self.clock_label.setText(current_time_str)
-
-        # 更新打工冷却时间
-        for row in range(self.user_table.rowCount()):
-            username_item = self.user_table.item(row, 0)
-            if username_item:
-                username = username_item.text()
-                account_info = self.logged_accounts.get(username, {})
-                new_cool_down_text = self.calculate_work_cool_down(account_info)
-                cool_down_item = self.user_table.item(row, 3)
-                if cool_down_item:
-                    cool_down_item.setText(new_cool_down_text)
-                else:
-                    self.user_table.setItem(row, 3, QTableWidgetItem(new_cool_down_text))
-
-                work_button = self.user_table.cellWidget(row, 5)
-                if work_button:
-                    is_valid = account_info.get("is_valid", False)
-                    work_button.setEnabled(is_valid)
-
-        self.user_table.viewport().update()
-
-        # 自动化功能逻辑
-        if self.is_automation_running:
-            for username, account_info in self.logged_accounts.items():
-                is_valid = account_info["is_valid"]
-                current_date = self.current_time.strftime("%Y-%m-%d")
-                last_sign_date = account_info.get("last_sign_date", "")
-                sign_status = last_sign_date == current_date
-                current_hour = self.current_time.hour
-                cool_down_text = self.calculate_work_cool_down(account_info)
-
-                # 输出日志，检查判断条件
-                # logger.info(f"账号: {username}, 签到状态: {sign_status}, 当前小时: {current_hour}, 冷却时间: {cool_down_text}")
-
-                # 自动签到逻辑
-                if is_valid and not sign_status and not (0 <= current_hour < 1):
-                    sign_task = ('sign', username)
-                    if sign_task not in self.task_queue:
-                        self.task_queue.append(sign_task)
-
-                # 自动打工逻辑
-                if is_valid and cool_down_text == "00:00:00":
-                    work_task = ('work', username)
-                    if work_task not in self.task_queue:
-                        self.task_queue.append(work_task)
-
-        # logger.info(f"更新任务队列: {self.task_queue}")
-        self.execute_task_if_available()
-        
-    def execute_task_if_available(self):
-        if self.task_queue and not self.is_task_running:
-            # 不立即从队列中移除任务，只记录当前任务索引
-            self.current_task_index += 1
-            if self.current_task_index < len(self.task_queue):
-                task_type, username = self.task_queue[self.current_task_index]
-                logger.info(f"即将执行任务 {task_type} - {username}，当前任务队列: {self.task_queue}")
-                self.is_task_running = True
-                if task_type == 'sign':
-                    logger.info(f"自动为用户 {username} 启动签到")
-                    self.start_sign_for_user(username, callback=self.task_complete)
-                elif task_type == 'work':
-                    logger.info(f"自动为用户 {username} 启动打工")
-                    self.start_work_for_user(username, callback=self.task_complete)
-            else:
-                # 若索引超出队列长度，重置索引
-                self.current_task_index = -1
-
-    def task_complete(self):
-        self.is_task_running = False  # 任务完成，解锁
-        if self.current_task_index >= 0 and self.current_task_index < len(self.task_queue):
-            # 任务完成后，从队列中移除当前任务
-            completed_task = self.task_queue.pop(self.current_task_index)
-            logger.info(f"任务 {completed_task} 已完成，从队列中移除，当前任务队列: {self.task_queue}")
-            # 由于移除了任务，需要调整当前索引
-            self.current_task_index -= 1
-
-        unique_tasks = []
-        seen = set()
-        for task in self.task_queue:
-            if task not in seen:
-                unique_tasks.append(task)
-                seen.add(task)
-        self.task_queue = unique_tasks
-
-        # 任务完成后，尝试执行下一个任务
-        self.execute_task_if_available()
-
-    def update_log_display(self): # 更新日志显示
-        if os.path.exists(self.log_file_path):
-            max_retries = 3
-            retries = 0
-            while retries < max_retries:
-                try:
-                    # 统一使用只读模式读取日志文件
-                    with io.open(self.log_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                        f.seek(0, os.SEEK_END)
-                        current_size = f.tell()
-                        if current_size > self.last_log_size:
-                            f.seek(self.last_log_size)
-                            new_log_content = ''.join([line.strip() + '\n' for line in f.readlines()])
-                            self.log_text_edit.insertPlainText(new_log_content)
-                            self.last_log_size = current_size
-                    self.log_text_edit.moveCursor(self.log_text_edit.textCursor().End)
-                    break
-                except Exception as e:
-                    retries += 1
-                    time.sleep(0.1)
-                    if retries == max_retries:
-                        QMessageBox.warning(self, "警告", f"读取日志文件时出错: {e}")
+        stats = self.task_executor.stats()
+        self.concurrency_label.setText(
+            f"{concurrency_controller.describe()}  执行中 {self.task_executor.running_count()}"
+            f"  等待 {self.task_executor.pending_count()}"
+            f"  超时 {stats['timed_out']}（损失 {stats['stalled_seconds']:.0f} 秒）")
+
+        # 只刷新当前可见行中随时间变化的列，窗口隐藏到托盘时不刷新
+        self.account_model.set_current_time(current_time)
+        if self.isVisible():
+            self.refresh_visible_rows()
+
+    def refresh_visible_rows(self):
+        first_row = self.user_table.rowAt(0)
+        if first_row < 0:
+            return
+        last_row = self.user_table.rowAt(self.user_table.viewport().height() - 1)
+        if last_row < 0:
+            last_row = self.account_model.rowCount() - 1
+        self.account_model.refresh_rows(first_row, last_row, SIGN_STATUS_COLUMN, WORK_BUTTON_COLUMN)
+
+    def run_due_tasks(self):
+        """把到期的签到/打工任务加入队列，并把调度定时器设置到下一个截止时间"""
+        self.scheduler_timer.stop()
+        if not self.is_automation_running:
+            return
+        due_tasks = self.scheduler.pop_due()
+        for task_type, username in due_tasks:
+            self.task_executor.submit(task_type, username)
+        if len(due_tasks) > 1:
+            logger.info(f"提交 {len(due_tasks)} 个到期任务，按限速预计 {self.task_executor.estimated_drain_seconds():.0f} 秒内全部开始执行")
+
+        wait_seconds = self.scheduler.seconds_until_next()
+        if wait_seconds is not None:
+            self.scheduler_timer.start(math.ceil(min(wait_seconds, MAX_SCHEDULER_WAIT) * 1000))
+
+    def reschedule_account(self, username):
+        """任务结束后按账号的最新状态重新计算截止时间"""
+        account_info = account_store.get(username)
+        if account_info is None:
+            self.scheduler.remove_account(username)
+        else:
+            self.scheduler.reschedule_account(username, account_info, retry=True)
 
  # 其他工具方法
-    def calculate_work_cool_down(self, account_info): # 计算打工冷却时间
-        last_work_time_str = account_info.get("last_work_time", "")
-        if last_work_time_str:
-            try:
-                last_work_time = datetime.strptime(last_work_time_str, "%Y-%m-%d %H:%M:%S")
-                cool_down_end_time = last_work_time + timedelta(hours=6)
-                remaining_time = cool_down_end_time - self.current_time
-                if remaining_time.total_seconds() > 0:
-                    total_seconds = int(remaining_time.total_seconds()) + (1 if remaining_time.microseconds > 0 else 0)
-                    hours = total_seconds // 3600
-                    minutes = (total_seconds % 3600) // 60
-                    seconds = total_seconds % 60
-                    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-            except ValueError:
-                logger.error(f"解析 last_work_time {last_work_time_str} 时出错，格式可能不正确")
-        return "00:00:00"
-
     def add_account(self, username, cookies):
         self.logged_accounts[username] = {
             "cookies": cookies,
@@ -716,16 +645,11 @@ class LoginTool(QWidget): # 登录工具面板类
         account_info = self.logged_accounts.get(username)
         if account_info:
             password = account_info.get("password")
-            session = requests.Session()
-            login_window = LoginWindow(session, username=username, password=password)
-            login_window.show()
+            session = create_session()
+            self._show_login_window(LoginWindow(session, username=username, password=password))
         else:
             logger.error(f"未找到 {username} 的账号信息，无法重登")
 
-    def save_config_changes(self):
-        self.config["accounts"] = self.logged_accounts
-        save_config(self.config)
-
 
 #开启启动项目
 def add_startup_registry_worker(queue):
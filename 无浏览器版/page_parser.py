@@ -0,0 +1,100 @@
+"""
+论坛页面解析：集中存放登录、签到、打工页面用到的预编译正则。
+正则未命中时，若安装了 lxml 则用 XPath 再查找一次，兼容属性顺序等写法变化。
+"""
+import re
+import html
+from datetime import timedelta
+from log_config import setup_logger
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    etree = lxml_html = None
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+FORMHASH_INPUT_PATTERN = re.compile(r'<input\b[^>]*\bname="formhash"[^>]*>')
+# 签到表单中的 formhash 输入框完整出现，说明页面上没有已签到提示
+SIGN_FORM_FORMHASH_PATTERN = re.compile(r'id="qiandao".*?<input\b[^>]*\bname="formhash"[^>]*>', re.S)
+LOGINHASH_PATTERN = re.compile(r'<div\b[^>]*\bid="main_messaqge_(\w+)"')
+VERIFY_IMG_PATTERN = re.compile(r'<img\b[^>]*\bclass="(?:[^"]*\s)?tsdm_verify(?:\s[^"]*)?"[^>]*>')
+SPACE_LINK_PATTERN = re.compile(r'<a\b[^>]*\btitle="访问我的空间"[^>]*>(.*?)</a>', re.S)
+WORK_WAIT_PATTERN = re.compile(r"您需要等待(\d+)小时(\d+)分钟(\d+)秒后即可进行。")
+TAG_PATTERN = re.compile(r'<!\[CDATA\[|\]\]>|<[^>]+>')
+VALUE_ATTR_PATTERN = re.compile(r'\bvalue\s*=\s*"([^"]*)"')
+SRC_ATTR_PATTERN = re.compile(r'\bsrc\s*=\s*"([^"]*)"')
+
+
+def _attribute(tag, pattern):
+    match = pattern.search(tag)
+    return html.unescape(match.group(1)) if match else None
+
+
+def _xpath_first(text, xpath):
+    """正则未命中时的后备查找，未安装 lxml 或页面无法解析时返回 None"""
+    if lxml_html is None or not text:
+        return None
+    try:
+        result = lxml_html.fromstring(text).xpath(xpath)
+    except (ValueError, etree.ParserError) as e:
+        logger.error(f"解析页面出错: {e}")
+        return None
+    return result[0] if result else None
+
+
+def strip_tags(text):
+    """去掉标签和 CDATA 标记，合并空白，用于读取 ajax 响应中的提示文本"""
+    return ' '.join(TAG_PATTERN.sub(' ', text).split())
+
+
+def find_formhash(text):
+    """查找页面中第一个 formhash 输入框的值，找不到时返回 None"""
+    match = FORMHASH_INPUT_PATTERN.search(text)
+    if match:
+        return _attribute(match.group(0), VALUE_ATTR_PATTERN)
+    return _xpath_first(text, '//input[@name="formhash"]/@value')
+
+
+def has_sign_form(text):
+    """签到表单及其 formhash 是否已经完整出现在文本中，用于流式读取时提前结束"""
+    return SIGN_FORM_FORMHASH_PATTERN.search(text) is not None
+
+
+def find_loginhash(text):
+    """从登录页的 main_messaqge_ 提示框 id 中取出 loginhash"""
+    match = LOGINHASH_PATTERN.search(text)
+    if match:
+        return match.group(1)
+    div_id = _xpath_first(text, '//div[starts-with(@id, "main_messaqge_")]/@id')
+    return div_id.split('main_messaqge_')[-1] if div_id else None
+
+
+def find_verify_image_url(text):
+    """查找登录页验证码图片的地址"""
+    match = VERIFY_IMG_PATTERN.search(text)
+    if match:
+        return _attribute(match.group(0), SRC_ATTR_PATTERN)
+    return _xpath_first(text, '//img[contains(concat(" ", normalize-space(@class), " "), " tsdm_verify ")]/@src')
+
+
+def has_space_link(text):
+    """“访问我的空间”链接是否已经完整出现在文本中，用于流式读取时提前结束"""
+    return SPACE_LINK_PATTERN.search(text) is not None
+
+
+def find_space_username(text):
+    """从“访问我的空间”链接中读取当前登录的用户名，未登录时返回 None"""
+    match = SPACE_LINK_PATTERN.search(text)
+    if match:
+        return html.unescape(strip_tags(match.group(1)))
+    link = _xpath_first(text, '//a[@title="访问我的空间"]')
+    return link.text_content().strip() if link is not None else None
+
+
+def find_work_wait(text):
+    """读取打工页面的剩余冷却时间，不在冷却中时返回 None"""
+    match = WORK_WAIT_PATTERN.search(text)
+    if not match:
+        return None
+    return timedelta(hours=int(match.group(1)), minutes=int(match.group(2)), seconds=int(match.group(3)))
@@ -0,0 +1,148 @@
+"""
+签到/打工请求的容错层：
+- 临时性错误（连接失败、超时、429、5xx）按指数退避加随机抖动重试；
+- 每个主机一个熔断器，连续失败达到阈值后暂停该主机的所有任务，到期后再放行；
+- 按请求是否可以重复提交决定能否重试：
+    页面 GET、签到 qiandao：可以重试，重复签到时论坛会返回“已签到”；
+    点广告 clickad、领取奖励 getcre：只在请求确定没有发出（连接失败）时重试，
+    其他失败交给下一次任务先检查打工页面再决定是否继续，避免重复领取。
+"""
+import time
+import random
+import asyncio
+import threading
+import aiohttp
+from log_config import setup_logger
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+MAX_ATTEMPTS = 3                # 单个请求最多尝试次数
+BACKOFF_BASE = 1.0              # 请求重试的基础等待秒数
+BACKOFF_CAP = 10.0              # 请求重试的最长等待秒数
+FAILURE_THRESHOLD = 5           # 连续失败多少次后熔断
+RESET_TIMEOUT = 30.0            # 首次熔断的暂停秒数，连续熔断时翻倍
+MAX_RESET_TIMEOUT = 600.0       # 熔断暂停的最长秒数
+TASK_DEADLINE = 120             # 单个签到/打工任务的总时限秒数，包括重试和点广告间的等待
+
+RETRY_SAFE = 'safe'             # 可以重复提交的请求
+RETRY_UNSENT = 'unsent'         # 只在请求未发出时重试的请求
+
+# 各请求的重试规则
+RETRY_POLICIES = {
+    'page': RETRY_SAFE,
+    'qiandao': RETRY_SAFE,
+    'clickad': RETRY_UNSENT,
+    'getcre': RETRY_UNSENT,
+}
+
+
+class CircuitOpenError(Exception):
+    """主机处于熔断状态，请求未发出"""
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"{host} 暂停请求中，{retry_after:.0f} 秒后恢复")
+        self.host = host
+        self.retry_after = retry_after
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """第 attempt 次（从 0 开始）重试前的等待秒数：指数增长，在后一半范围内随机抖动，避免各账号同时重试"""
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def is_transient(error):
+    """连接失败、超时、429 和 5xx 视为临时性错误，可以重试并计入熔断"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def can_retry(policy, error):
+    if policy == RETRY_SAFE:
+        return True
+    # 连接未建立，请求一定没有发出
+    return isinstance(error, aiohttp.ClientConnectorError)
+
+
+class CircuitBreaker:
+    """
+    单个主机的熔断器：连续失败 FAILURE_THRESHOLD 次后打开，暂停期间拒绝请求；
+    暂停结束后放行请求，成功一次即恢复，再次失败则以加倍的暂停时间重新打开。
+    """
+
+    def __init__(self, host, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 max_reset_timeout=MAX_RESET_TIMEOUT):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_count = 0            # 连续熔断次数，恢复后清零
+        self._open_until = 0.0          # 熔断结束的时间点（time.monotonic）
+
+    def allow(self):
+        return self.retry_after() <= 0
+
+    def retry_after(self):
+        """距离熔断结束的秒数，未熔断时为 0"""
+        with self._lock:
+            return max(0.0, self._open_until - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            recovered = self._open_count > 0
+            self._failures = 0
+            self._open_count = 0
+        if recovered:
+            logger.info(f"{self.host} 已恢复正常，继续执行任务")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures < self.failure_threshold or time.monotonic() < self._open_until:
+                return
+            timeout = min(self.max_reset_timeout, self.reset_timeout * (2 ** self._open_count))
+            self._open_count += 1
+            self._open_until = time.monotonic() + timeout
+            failures = self._failures
+        logger.error(f"{self.host} 连续 {failures} 次请求失败，暂停该主机的所有任务 {timeout:.0f} 秒")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(host):
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+        return breaker
+
+
+async def call_with_retry(make_coro, host, policy=RETRY_SAFE, attempts=MAX_ATTEMPTS):
+    """
+    执行 make_coro() 返回的协程，临时性错误按 policy 决定是否退避重试。
+    主机熔断时抛出 CircuitOpenError，重试用尽或不可重试时抛出最后一次的错误。
+    """
+    breaker = get_breaker(host)
+    for attempt in range(attempts):
+        retry_after = breaker.retry_after()
+        if retry_after > 0:
+            raise CircuitOpenError(host, retry_after)
+        try:
+            result = await make_coro()
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            breaker.record_failure()
+            if attempt + 1 >= attempts or not can_retry(policy, e):
+                raise
+            delay = backoff_delay(attempt)
+            logger.info(f"请求 {host} 出错: {e}，{delay:.1f} 秒后进行第 {attempt + 2} 次尝试")
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
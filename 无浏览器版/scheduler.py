@@ -0,0 +1,138 @@
+import heapq
+import time
+import itertools
+from datetime import datetime, timedelta
+from log_config import setup_logger
+from account_store import account_store
+from dispatch_policy import sign_jitter_offset
+from resilience import backoff_delay
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+SIGN_OPEN_HOUR = 1                      # 每天 1 点开放签到
+RETRY_DELAY = 60                        # 任务执行后状态未推进时，首次重试的等待秒数
+MAX_RETRY_DELAY = 3600                  # 连续重试时等待秒数按指数增长的上限
+
+
+def next_sign_time(account_info, now, jitter=0.0):
+    """计算账号下一次可以签到的时间，jitter 为该账号在开放签到后的偏移秒数，cookie 失效时返回 None"""
+    if not account_info.get("is_valid", False):
+        return None
+    open_time = now.replace(hour=SIGN_OPEN_HOUR, minute=0, second=0, microsecond=0) + timedelta(seconds=jitter)
+    if account_info.get("last_sign_date", "") == now.strftime("%Y-%m-%d"):
+        # 今日已签到，等到明天开放签到
+        return open_time + timedelta(days=1)
+    return max(now, open_time)
+
+
+def next_work_time(username, account_info, now):
+    """计算账号打工冷却结束的时间，cookie 失效时返回 None；冷却结束时间取自账号仓库中缓存的时间戳"""
+    if not account_info.get("is_valid", False):
+        return None
+    work_deadline = account_store.work_deadline(username)
+    if work_deadline:
+        return max(now, datetime.fromtimestamp(work_deadline))
+    return now
+
+
+def _account_signature(account_info):
+    return (account_info.get("is_valid", False),
+            account_info.get("last_sign_date", ""),
+            account_info.get("last_work_time", ""))
+
+
+class DeadlineScheduler:
+    """
+    基于最小堆的截止时间调度器：为每个账号记录下一次签到/打工的时间点，
+    只在账号状态变化时重新计算，到点后一次性取出所有到期任务。
+    sign_jitter 不为 0 时，各账号的签到时间按用户名分散到 1 点后的 sign_jitter 秒内，避免同一时刻集中签到。
+    """
+
+    def __init__(self, sign_jitter=0):
+        self.sign_jitter = sign_jitter
+        self._heap = []                 # (截止时间戳, 序号, 任务类型, 用户名)
+        self._deadlines = {}            # (任务类型, 用户名) -> 当前有效的截止时间戳
+        self._signatures = {}           # 用户名 -> 上次计算时的账号状态
+        self._retries = {}              # 用户名 -> 状态未推进的连续重试次数
+        self._counter = itertools.count()
+
+    def schedule(self, task_type, username, deadline):
+        """登记任务的截止时间戳，覆盖该任务之前的截止时间"""
+        key = (task_type, username)
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, next(self._counter), task_type, username))
+
+    def cancel(self, task_type, username):
+        # 堆中的旧条目在出堆时按 _deadlines 校验后丢弃
+        self._deadlines.pop((task_type, username), None)
+
+    def remove_account(self, username):
+        self.cancel('sign', username)
+        self.cancel('work', username)
+        self._signatures.pop(username, None)
+        self._retries.pop(username, None)
+
+    def reschedule_account(self, username, account_info, now=None, retry=False):
+        """
+        根据账号状态重新计算签到/打工时间。
+        retry 为 True 表示刚执行过任务，若计算结果仍是立即执行，说明任务失败，
+        按连续失败次数指数退避并加随机抖动后再重试，避免论坛故障时所有账号同时反复重试。
+        """
+        now = now or datetime.now()
+        signature = _account_signature(account_info)
+        if not retry or signature != self._signatures.get(username):
+            # 账号状态有推进，重新开始计算退避
+            self._retries.pop(username, None)
+        self._signatures[username] = signature
+        retry_at = None
+        sign_deadline = next_sign_time(account_info, now, sign_jitter_offset(username, self.sign_jitter))
+        for task_type, deadline in (('sign', sign_deadline), ('work', next_work_time(username, account_info, now))):
+            if deadline is None:
+                self.cancel(task_type, username)
+                continue
+            if retry and deadline <= now:
+                if retry_at is None:
+                    attempt = self._retries.get(username, 0)
+                    self._retries[username] = attempt + 1
+                    retry_at = now + timedelta(seconds=backoff_delay(attempt, RETRY_DELAY, MAX_RETRY_DELAY))
+                deadline = retry_at
+            self.schedule(task_type, username, deadline.timestamp())
+
+    def sync_accounts(self, accounts, now=None):
+        """与账号字典同步：移除已删除的账号，只为新增或状态变化的账号重新计算"""
+        now = now or datetime.now()
+        for username in list(self._signatures):
+            if username not in accounts:
+                self.remove_account(username)
+        for username, account_info in accounts.items():
+            if self._signatures.get(username) != _account_signature(account_info):
+                self.reschedule_account(username, account_info, now)
+
+    def pop_due(self, now_ts=None):
+        """取出所有已到期的任务，返回 (任务类型, 用户名) 列表"""
+        now_ts = time.time() if now_ts is None else now_ts
+        due = []
+        while self._heap and self._heap[0][0] <= now_ts:
+            deadline, _, task_type, username = heapq.heappop(self._heap)
+            key = (task_type, username)
+            if self._deadlines.get(key) != deadline:
+                continue
+            del self._deadlines[key]
+            due.append(key)
+        return due
+
+    def next_deadline(self):
+        """返回最早的有效截止时间戳，没有待调度任务时返回 None"""
+        while self._heap:
+            deadline, _, task_type, username = self._heap[0]
+            if self._deadlines.get((task_type, username)) == deadline:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    def seconds_until_next(self, now_ts=None):
+        deadline = self.next_deadline()
+        if deadline is None:
+            return None
+        now_ts = time.time() if now_ts is None else now_ts
+        return max(0.0, deadline - now_ts)
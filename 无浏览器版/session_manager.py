@@ -0,0 +1,41 @@
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from log_config import setup_logger
+from concurrency_controller import concurrency_controller, is_overload_status
+from metrics import (metrics, record_request, record_response, record_bytes, request_action,
+                     OUTCOME_OK, OUTCOME_HTTP_ERROR)
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+# 连接池参数：登录只访问论坛这一个主机
+POOL_CONNECTIONS = 1     # 每个会话缓存的主机连接池数量
+POOL_MAXSIZE = 2         # 每个主机连接池保留的 keep-alive 连接数
+REQUEST_TIMEOUT = (10, 20)  # requests 的 (连接超时, 读取超时) 秒数，每个请求都必须传入
+
+
+def _record_response(response, *args, **kwargs):
+    # 登录等同步请求的延迟和状态码同样报告给并发控制器
+    ttfb = response.elapsed.total_seconds()
+    concurrency_controller.record(ttfb, is_overload_status(response.status_code))
+    # elapsed 只计到收到响应头；这里的会话都不使用 stream，在钩子中读取响应内容并计入总耗时
+    action = request_action(response.url)
+    started = time.monotonic()
+    size = len(response.content)
+    total = ttfb + time.monotonic() - started
+    metrics.observe('tsdm_http_ttfb_seconds', ttfb, action=action)
+    record_response(action, response.status_code)
+    record_bytes(action, size)
+    record_request(action, total, OUTCOME_HTTP_ERROR if response.status_code >= 400 else OUTCOME_OK)
+
+
+def create_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE):
+    """
+    创建挂载了连接池适配器的会话对象。
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.hooks['response'].append(_record_response)
+    return session
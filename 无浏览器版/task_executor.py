@@ -0,0 +1,305 @@
+import time
+import asyncio
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import forum_site
+from log_config import setup_logger
+from task_queue import TaskQueue
+from resilience import TASK_DEADLINE, get_breaker
+from metrics import record_task, record_task_wait, OUTCOME_OK, OUTCOME_TIMEOUT, OUTCOME_ERROR
+from dispatch_policy import MAX_TASK_RATE, TASK_RATE_BURST, make_bucket, task_priority, estimate_drain_seconds
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+MAX_WORKERS = 8         # 同时执行的任务数上限，实际并发数由并发控制器调整
+MAX_PER_HOST = 8        # 同一主机同时执行的任务数上限
+WATCHDOG_INTERVAL = 5   # 看门狗检查超时任务的间隔秒数
+WATCHDOG_GRACE = 10     # 任务超过时限多少秒仍未结束时由看门狗强制取消
+
+
+class TaskExecutor:
+    """
+    有界并发的任务执行器：
+    - 限制同时执行的任务数；
+    - 同一账号同一时间只执行一个任务（签到与打工互斥）；
+    - 同一主机的在途任务数不超过上限；
+    - 同一主机按令牌桶限速启动任务，等待中的任务按优先级、提交顺序依次启动；
+    - 传入 controller 时，同时执行的任务数由并发控制器在 1 到 max_workers 之间动态调整；
+    - 主机熔断期间暂停该主机的所有任务，熔断结束后自动继续；
+    - 每个任务最多执行 task_deadline 秒，看门狗取消超时未结束的任务，避免一个卡住的连接占住执行名额。
+    执行函数是协程函数时，任务作为 asyncio.Task 在 loop 事件循环中执行，不占用线程；
+    账号和主机的名额在任务真正结束后才释放，取消请求发出后任务仍在运行时不会启动同一账号的其他任务。
+    """
+
+    def __init__(self, handlers, max_workers=MAX_WORKERS, max_per_host=MAX_PER_HOST, on_finished=None, loop=None,
+                 max_rate=MAX_TASK_RATE, rate_burst=TASK_RATE_BURST, controller=None, task_deadline=TASK_DEADLINE):
+        self.handlers = handlers            # 任务类型 -> 执行函数(username) 或协程函数
+        self.loop = loop                    # 执行协程任务的事件循环
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.max_rate = max_rate            # 同一主机每秒最多启动的任务数，0 表示不限速
+        self.rate_burst = rate_burst
+        self.on_finished = on_finished      # 回调(task_type, username)，在工作线程或事件循环线程中调用
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tsdm_task')
+        self._lock = threading.Lock()
+        self._pending = TaskQueue()         # 等待执行的任务，按优先级、提交顺序排列
+        self._buckets = {}                  # 主机 -> 令牌桶
+        self._wake_timer = None             # 令牌不足时，等到有令牌再启动任务的定时器
+        self._wake_at = None                # 定时器触发的时间点（time.monotonic）
+        self._queued = {}                   # 等待中或执行中的 (任务类型, 用户名) -> 提交时间
+        self._busy_accounts = set()         # 正在执行任务的账号
+        self._host_in_flight = {}           # 主机 -> 在途任务数
+        self._running = 0
+        self._shutdown = False
+        self.task_deadline = task_deadline
+        self._in_flight = {}                # (任务类型, 用户名) -> [开始时间, future 或 asyncio.Task]
+        self._reported = set()              # 看门狗已报告、等待其真正结束的任务
+        self._watchdog = None
+        self._stop_event = threading.Event()
+        # 执行统计：超时任务占用的秒数即卡住损失的执行时间
+        self._stats = {'completed': 0, 'failed': 0, 'timed_out': 0, 'stalled_seconds': 0.0}
+        self.controller = controller        # 并发控制器，为空时固定为 max_workers
+        if controller is not None:
+            controller.set_maximum(max_workers)
+            controller.add_listener(self._on_limit_changed)
+
+    def submit(self, task_type, username, host=None, priority=None):
+        """提交任务，同一任务已在等待或执行中时忽略，返回是否新加入；host 默认为论坛主机，priority 默认按任务类型决定"""
+        if task_type not in self.handlers:
+            raise ValueError(f"未知的任务类型: {task_type}")
+        task = (task_type, username)
+        if host is None:
+            host = forum_site.host()
+        if priority is None:
+            priority = task_priority(task_type)
+        with self._lock:
+            if self._shutdown or task in self._queued:
+                return False
+            self._queued[task] = time.monotonic()
+            self._pending.push(task_type, username, host, priority)
+            logger.info(f"添加 {username} 的 {task_type} 任务，等待中任务数: {len(self._pending)}")
+            ready = self._take_ready_locked()
+        self._start(ready)
+        return True
+
+    def is_queued(self, task_type, username):
+        with self._lock:
+            return (task_type, username) in self._queued
+
+    def cancel(self, task_type, username):
+        """取消等待中的任务，已开始执行的任务不受影响，返回是否取消成功"""
+        with self._lock:
+            if not self._pending.remove(task_type, username):
+                return False
+            self._queued.pop((task_type, username), None)
+        logger.info(f"已取消 {username} 的 {task_type} 任务")
+        return True
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def running_count(self):
+        with self._lock:
+            return self._running
+
+    def estimated_drain_seconds(self):
+        """按限速估算启动全部等待中任务需要的秒数"""
+        with self._lock:
+            return estimate_drain_seconds(len(self._pending), self.max_rate)
+
+    def stats(self):
+        """返回执行统计：完成数、出错数、超时数、超时任务累计占用的秒数"""
+        with self._lock:
+            return dict(self._stats)
+
+    def shutdown(self, wait=False):
+        self._stop_event.set()
+        with self._lock:
+            self._shutdown = True
+            self._pending.clear()
+            self._cancel_wake_timer_locked()
+        self._pool.shutdown(wait=wait)
+
+    def concurrency_limit(self):
+        """当前允许同时执行的任务数"""
+        if self.controller is None:
+            return self.max_workers
+        return min(self.max_workers, self.controller.limit)
+
+    def _take_ready_locked(self):
+        """在持有锁的情况下，按优先级取出满足并发和限速条件的等待任务并登记为执行中"""
+        ready = []
+        limit = self.concurrency_limit()
+        if not self._pending or self._running >= limit:
+            return ready
+        wait_seconds = None
+        blocked_hosts = set()               # 本轮已无法再启动任务的主机
+        for task_type, username, host in self._pending:
+            # 所有主机都无法启动任务时提前结束，不再遍历剩余的等待任务
+            if self._running + len(ready) >= limit or len(blocked_hosts) >= len(self._pending.hosts()):
+                break
+            if host in blocked_hosts or username in self._busy_accounts:
+                continue
+            if self._host_in_flight.get(host, 0) >= self.max_per_host:
+                blocked_hosts.add(host)
+                continue
+            delay = get_breaker(host).retry_after()
+            bucket = self._get_bucket_locked(host)
+            if delay <= 0 and bucket is not None:
+                delay = bucket.try_take()
+            if delay > 0:
+                wait_seconds = delay if wait_seconds is None else min(wait_seconds, delay)
+                blocked_hosts.add(host)
+                continue
+            self._busy_accounts.add(username)
+            self._host_in_flight[host] = self._host_in_flight.get(host, 0) + 1
+            ready.append((task_type, username, host))
+        # 遍历结束后再出队，遍历期间不修改队列
+        for task_type, username, host in ready:
+            self._pending.remove(task_type, username)
+            self._running += 1
+            logger.info(f"开始执行 {username} 的 {task_type} 任务，执行中任务数: {self._running}")
+        if wait_seconds is not None:
+            self._schedule_wake_locked(wait_seconds)
+        return ready
+
+    def _get_bucket_locked(self, host):
+        if host not in self._buckets:
+            self._buckets[host] = make_bucket(self.max_rate, self.rate_burst)
+        return self._buckets[host]
+
+    def _schedule_wake_locked(self, delay):
+        # 已有更早触发的定时器时沿用
+        wake_at = time.monotonic() + delay
+        if self._wake_timer is not None:
+            if self._wake_at <= wake_at:
+                return
+            self._wake_timer.cancel()
+        self._wake_at = wake_at
+        self._wake_timer = threading.Timer(delay, self._on_wake)
+        self._wake_timer.daemon = True
+        self._wake_timer.start()
+
+    def _cancel_wake_timer_locked(self):
+        if self._wake_timer is not None:
+            self._wake_timer.cancel()
+            self._wake_timer = None
+            self._wake_at = None
+
+    def _on_limit_changed(self, limit):
+        # 并发数调大后立即启动等待中的任务，调小时让执行中的任务自然结束
+        with self._lock:
+            ready = [] if self._shutdown else self._take_ready_locked()
+        self._start(ready)
+
+    def _on_wake(self):
+        with self._lock:
+            self._wake_timer = None
+            self._wake_at = None
+            ready = [] if self._shutdown else self._take_ready_locked()
+        self._start(ready)
+
+    def _start(self, ready):
+        """在锁外启动任务，完成回调可能在当前线程中立即执行"""
+        for task_type, username, host in ready:
+            key = (task_type, username)
+            handler = self.handlers[task_type]
+            started = time.monotonic()
+            with self._lock:
+                self._in_flight[key] = [started, None]
+                submitted = self._queued.get(key, started)
+            record_task_wait(task_type, started - submitted)
+            on_done = partial(self._on_done, task_type, username, host)
+            if asyncio.iscoroutinefunction(handler):
+                self.loop.call_soon_threadsafe(self._create_task, key, handler, on_done)
+                continue
+            future = self._pool.submit(handler, username)
+            with self._lock:
+                if key in self._in_flight:
+                    self._in_flight[key][1] = future
+            future.add_done_callback(on_done)
+        if ready:
+            self._ensure_watchdog()
+
+    def _create_task(self, key, handler, on_done):
+        """
+        在事件循环线程中直接把执行函数创建为任务，超过时限时取消它。
+        不用 asyncio.wait_for 包一层：外层任务被取消时可能先于内层结束，而名额要等执行函数真正结束后才释放。
+        """
+        task = self.loop.create_task(handler(key[1]))
+        deadline = self.loop.call_later(self.task_deadline, task.cancel)
+        with self._lock:
+            if key in self._in_flight:
+                self._in_flight[key][1] = task
+        task.add_done_callback(lambda finished: deadline.cancel())
+        task.add_done_callback(on_done)
+
+    def _ensure_watchdog(self):
+        with self._lock:
+            if self._watchdog is not None or self._shutdown:
+                return
+            self._watchdog = threading.Thread(target=self._watch, name='tsdm_watchdog', daemon=True)
+        self._watchdog.start()
+
+    def _watch(self):
+        """定期检查执行中的任务，取消超过时限仍未结束的任务"""
+        while not self._stop_event.wait(WATCHDOG_INTERVAL):
+            now = time.monotonic()
+            with self._lock:
+                overdue = [(key, started, future) for key, (started, future) in self._in_flight.items()
+                           if future is not None and now - started > self.task_deadline + WATCHDOG_GRACE
+                           and key not in self._reported]
+            for (task_type, username), started, future in overdue:
+                if isinstance(future, asyncio.Future):
+                    # 取消请求在事件循环中生效，协程可能仍在运行，名额由任务结束时的回调释放
+                    self.loop.call_soon_threadsafe(future.cancel)
+                    message = "已请求取消，任务结束后释放账号"
+                elif future.cancel():
+                    # 还在线程池中排队、没有开始执行的任务，取消后立即触发完成回调
+                    logger.error(f"看门狗：{username} 的 {task_type} 任务已执行 {now - started:.0f} 秒，已强制取消")
+                    continue
+                else:
+                    # 线程池中的任务无法中断，等待其自行结束
+                    message = "无法取消"
+                # 只报告一次，任务真正结束前账号保持占用
+                with self._lock:
+                    if self._in_flight.get((task_type, username), [None, None])[1] is future:
+                        self._reported.add((task_type, username))
+                logger.error(f"看门狗：{username} 的 {task_type} 任务已执行 {now - started:.0f} 秒，{message}")
+
+    def _on_done(self, task_type, username, host, future):
+        key = (task_type, username)
+        error = None if future.cancelled() else future.exception()
+        timed_out = future.cancelled() or isinstance(error, asyncio.TimeoutError)
+        if timed_out:
+            logger.error(f"{username} 的 {task_type} 任务超过 {self.task_deadline} 秒未完成，已取消")
+        elif error is not None:
+            logger.error(f"执行 {username} 的 {task_type} 任务时出错: {error}", exc_info=error)
+        with self._lock:
+            started = self._in_flight.pop(key, [time.monotonic()])[0]
+            elapsed = time.monotonic() - started
+            self._reported.discard(key)
+            if timed_out:
+                outcome = OUTCOME_TIMEOUT
+                self._stats['timed_out'] += 1
+                self._stats['stalled_seconds'] += elapsed
+            elif error is not None:
+                outcome = OUTCOME_ERROR
+                self._stats['failed'] += 1
+            else:
+                outcome = OUTCOME_OK
+                self._stats['completed'] += 1
+            self._queued.pop(key, None)
+            self._busy_accounts.discard(username)
+            self._host_in_flight[host] -= 1
+            self._running -= 1
+            ready = [] if self._shutdown else self._take_ready_locked()
+        record_task(task_type, elapsed, outcome)
+        self._start(ready)
+        if self.on_finished:
+            try:
+                self.on_finished(task_type, username)
+            except Exception as e:
+                logger.error(f"处理 {username} 的 {task_type} 任务完成回调时出错: {e}")
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+
+
+class TaskQueue:
+    """
+    按 (任务类型, 用户名) 建立索引的优先级队列：
+    每个优先级一个有序字典，同一优先级内先进先出。
+    入队、去重、取消、查找都是 O(1)；优先级只有少数几档，按优先级遍历的开销可以忽略。
+    本身不加锁，由调用方保证同一时间只有一个线程使用。
+    """
+
+    def __init__(self):
+        self._buckets = {}              # 优先级 -> OrderedDict((任务类型, 用户名) -> 主机)
+        self._index = {}                # (任务类型, 用户名) -> 优先级
+        self._host_counts = {}          # 主机 -> 等待中的任务数
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def push(self, task_type, username, host, priority):
+        """加入队尾，任务已在队列中时返回 False"""
+        key = (task_type, username)
+        if key in self._index:
+            return False
+        bucket = self._buckets.get(priority)
+        if bucket is None:
+            bucket = self._buckets[priority] = OrderedDict()
+        bucket[key] = host
+        self._index[key] = priority
+        self._host_counts[host] = self._host_counts.get(host, 0) + 1
+        return True
+
+    def remove(self, task_type, username):
+        """从队列中移除任务，任务不在队列中时返回 False"""
+        key = (task_type, username)
+        priority = self._index.pop(key, None)
+        if priority is None:
+            return False
+        bucket = self._buckets[priority]
+        host = bucket.pop(key)
+        if not bucket:
+            del self._buckets[priority]
+        self._host_counts[host] -= 1
+        if not self._host_counts[host]:
+            del self._host_counts[host]
+        return True
+
+    def get(self, task_type, username):
+        """返回任务的 (优先级, 主机)，不在队列中时返回 None"""
+        key = (task_type, username)
+        priority = self._index.get(key)
+        if priority is None:
+            return None
+        return priority, self._buckets[priority][key]
+
+    def hosts(self):
+        """有等待中任务的主机"""
+        return self._host_counts.keys()
+
+    def clear(self):
+        self._buckets.clear()
+        self._index.clear()
+        self._host_counts.clear()
+
+    def __iter__(self):
+        """按优先级、入队顺序遍历 (任务类型, 用户名, 主机)，遍历期间不能修改队列"""
+        for priority in sorted(self._buckets):
+            for (task_type, username), host in self._buckets[priority].items():
+                yield task_type, username, host
@@ -0,0 +1,46 @@
+"""
+测试公共设置：程序模块按文件名互相导入，把程序目录加入 sys.path；
+日志和配置文件都放到临时目录，测试不会写入程序目录中的日志和账号配置。
+"""
+import os
+import sys
+import tempfile
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(APP_DIR, 'fixtures')
+
+sys.path.insert(0, APP_DIR)
+# 必须在导入任何程序模块之前设置，setup_logger 在导入时就会打开日志文件
+os.environ.setdefault('TSDM_LOG_FILE', os.path.join(tempfile.mkdtemp(prefix='tsdm_test_'), 'tsdm_sign_tools.log'))
+
+
+@pytest.fixture(autouse=True)
+def temp_config_file(tmp_path, monkeypatch):
+    import config_handler
+    from account_store import account_store
+    monkeypatch.setattr(config_handler, 'CONFIG_FILE', str(tmp_path / 'login_info.json'))
+    account_store.load()
+    yield
+    # 恢复配置文件路径之前写回未保存的修改，延迟写盘和退出时的写盘都不会落到程序目录
+    account_store.flush()
+
+
+@pytest.fixture
+def fake_forum():
+    """在后台线程启动替身论坛，测试期间所有请求都发往它"""
+    import forum_site
+    from fake_forum import FakeForum
+    forum = FakeForum()
+    forum_site.set_base_url(forum.start())
+    yield forum
+    forum.stop()
+    forum_site.set_base_url(None)
+
+
+@pytest.fixture
+def read_fixture():
+    def read(name):
+        with open(os.path.join(FIXTURE_DIR, name), encoding='utf-8') as f:
+            return f.read()
+    return read
@@ -0,0 +1,44 @@
+"""
+账号仓库的 cookie 有效期缓存：有效期内重复确认不应标记为脏、重写配置文件。
+"""
+import pytest
+from account_store import AccountStore
+from fake_forum import make_account
+
+
+@pytest.fixture
+def store():
+    store = AccountStore(flush_delay=60)
+    store.upsert('neo', **{key: value for key, value in make_account('neo').items() if key != 'username'})
+    store.flush()
+    yield store
+    store._cancel_flush_timer()
+
+
+def test_mark_valid_within_ttl_skips_write(store):
+    assert store.mark_valid('neo')
+    assert store.is_recently_valid('neo')
+    store.flush()
+    assert store.mark_valid('neo')
+    assert not store._dirty
+
+
+def test_mark_valid_after_ttl_or_invalidate(store):
+    store.mark_valid('neo')
+    store.flush()
+    assert not store.is_recently_valid('neo', ttl=0)
+    store.set_setting('validity_ttl', 0)
+    store.flush()
+    assert store.mark_valid('neo')
+    assert store._dirty
+    store.flush()
+    store.set_setting('validity_ttl', 3600)
+    store.invalidate('neo')
+    store.flush()
+    assert store.mark_valid('neo')
+    assert store.get('neo')['is_valid'] is True
+    assert store.is_recently_valid('neo')
+
+
+def test_mark_valid_unknown_account(store):
+    assert store.mark_valid('nobody') is False
@@ -0,0 +1,54 @@
+"""
+签到结果判定和流式读取的提前结束条件，用 fixtures 目录保存的页面和签到响应校验。
+"""
+import pytest
+import async_engine
+from page_parser import SIGN_FORM_FORMHASH_PATTERN
+from async_engine import (parse_sign_response, SIGN_RESULT_SUCCESS, SIGN_RESULT_ALREADY,
+                          SIGN_RESULT_FAILURE, SIGN_RESULT_UNKNOWN)
+
+
+def ajax(message):
+    return f'<?xml version="1.0" encoding="utf-8"?>\n<root><![CDATA[<div class="c">{message}</div>]]></root>'
+
+
+@pytest.mark.parametrize('text, expected', [
+    (ajax('恭喜你签到成功!获得随机奖励 天使币 9 .'), SIGN_RESULT_SUCCESS),
+    (ajax('您今日已经签到，请明天再来！'), SIGN_RESULT_ALREADY),
+    # 无法区分已签到和签到还未开始，交给签到页面重新判断
+    (ajax('您今天已经签到过了或者签到时间还未开始'), SIGN_RESULT_UNKNOWN),
+    (ajax('您需要先登录才能继续本操作'), SIGN_RESULT_FAILURE),
+    (ajax('您的请求来路不正确或表单验证串不符，无法提交'), SIGN_RESULT_FAILURE),
+    (ajax('系统繁忙'), SIGN_RESULT_UNKNOWN),
+])
+def test_parse_sign_response(text, expected):
+    assert parse_sign_response(text)[0] == expected
+
+
+def test_parse_sign_response_fixture(read_fixture):
+    assert parse_sign_response(read_fixture('sign_response.xml')) == (
+        SIGN_RESULT_SUCCESS, '提示信息 恭喜你签到成功!获得随机奖励 天使币 9 .')
+
+
+@pytest.mark.parametrize('fixture, is_complete, expected', [
+    ('sign_page.html', async_engine._sign_page_complete, True),
+    ('sign_page_signed.html', async_engine._sign_page_complete, True),
+    ('sign_page_logged_out.html', async_engine._sign_page_complete, True),
+    ('login_page.html', async_engine._sign_page_complete, False),
+    ('work_page_wait.html', async_engine._work_page_complete, True),
+    ('sign_page.html', async_engine._work_page_complete, False),
+    ('sign_page.html', async_engine._login_state_complete, True),
+    ('sign_page_logged_out.html', async_engine._login_state_complete, True),
+    ('login_page.html', async_engine._login_state_complete, False),
+])
+def test_page_complete(read_fixture, fixture, is_complete, expected):
+    assert is_complete(read_fixture(fixture)) is expected
+
+
+def test_sign_page_complete_before_page_end(read_fixture):
+    """签到表单完整出现后即可停止读取，不需要下载页面剩余部分"""
+    text = read_fixture('sign_page.html')
+    end = SIGN_FORM_FORMHASH_PATTERN.search(text).end()
+    assert end < len(text)
+    assert async_engine._sign_page_complete(text[:end])
+    assert not async_engine._sign_page_complete(text[:end - 1])
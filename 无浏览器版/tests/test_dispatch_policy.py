@@ -0,0 +1,41 @@
+"""
+按令牌桶取令牌、带时限执行协程的公共帮助函数，供 run_batch 和 cookie 批量检查共用。
+"""
+import time
+import asyncio
+from dispatch_policy import make_bucket, take_token, run_with_deadline
+from metrics import OUTCOME_OK, OUTCOME_TIMEOUT, OUTCOME_ERROR
+
+
+def test_take_token_waits_for_refill():
+    async def take_all():
+        bucket = make_bucket(20, burst=2)
+        started = time.monotonic()
+        for _ in range(4):
+            await take_token(bucket)
+        return time.monotonic() - started
+
+    # 前两个令牌立即取得，后两个按每秒 20 个补充
+    assert 0.08 <= asyncio.run(take_all()) < 0.5
+
+
+def test_take_token_unlimited():
+    asyncio.run(take_token(make_bucket(0)))
+
+
+def test_run_with_deadline_outcomes():
+    async def value():
+        return 42
+
+    async def stuck():
+        await asyncio.sleep(10)
+
+    async def broken():
+        raise ValueError('bad page')
+
+    async def run_all():
+        return [await run_with_deadline(value(), '测试'),
+                await run_with_deadline(stuck(), '测试', deadline=0.05),
+                await run_with_deadline(broken(), '测试')]
+
+    assert asyncio.run(run_all()) == [(42, OUTCOME_OK), (None, OUTCOME_TIMEOUT), (None, OUTCOME_ERROR)]
@@ -0,0 +1,53 @@
+"""
+登录窗口对替身论坛走一遍真实的登录流程：取验证码、提交登录表单、保存 cookie。
+"""
+import os
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+
+from account_store import account_store
+from session_manager import create_session
+from tsdm_login_part import LoginWindow
+
+
+@pytest.fixture(scope='module')
+def qapp():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def make_window(forum, password):
+    window = LoginWindow(create_session())
+    window.username_input.setText('neo')
+    window.password_input.setText(password)
+    window.verification_input.setText(forum.verify_code)
+    return window
+
+
+def test_login_saves_account(qapp, fake_forum):
+    window = make_window(fake_forum, fake_forum.password)
+    assert window.img_label is not None
+    succeeded = []
+    window.login_succeeded.connect(succeeded.append)
+    window.submit()
+
+    assert succeeded == ['neo']
+    assert window.error_label.text() == ''
+    account = account_store.get('neo')
+    assert account['is_valid'] is True
+    assert account['cookies']
+    assert account_store.is_recently_valid('neo')
+    assert fake_forum.stats().get('login') == 1
+
+
+def test_login_wrong_password(qapp, fake_forum):
+    window = make_window(fake_forum, 'wrong')
+    succeeded = []
+    window.login_succeeded.connect(succeeded.append)
+    window.submit()
+    window.close()
+
+    assert succeeded == []
+    assert window.error_label.text() == "登录失败，请检查用户名、密码和验证码。"
+    assert account_store.get('neo') is None
@@ -0,0 +1,95 @@
+"""
+页面解析的正确性与耗时：在 fixtures 目录保存的页面上校验 page_parser 的解析结果，
+并与 BeautifulSoup 旧写法、lxml XPath 后备查找对比耗时，测试依赖见仓库根目录的 requirements-dev.txt。
+
+用法: python -m pytest tests/test_page_parser.py，同一页面同一解析项的三种写法分在一组对比
+"""
+from datetime import timedelta
+import pytest
+from bs4 import BeautifulSoup
+import page_parser
+
+
+def soup_formhash(text):
+    formhash_input = BeautifulSoup(text, 'html.parser').find('input', {'name': 'formhash'})
+    return formhash_input.get('value') if formhash_input else None
+
+
+def soup_loginhash(text):
+    main_message_div = BeautifulSoup(text, 'html.parser').find('div', id=lambda x: x and x.startswith('main_messaqge_'))
+    return main_message_div.get('id').split('main_messaqge_')[-1] if main_message_div else None
+
+
+def soup_verify_image_url(text):
+    verify_img = BeautifulSoup(text, 'html.parser').find('img', class_='tsdm_verify')
+    return verify_img.get('src') if verify_img else None
+
+
+def soup_space_username(text):
+    space_link_element = BeautifulSoup(text, 'html.parser').find('a', {'title': '访问我的空间'})
+    return space_link_element.get_text().strip() if space_link_element else None
+
+
+# (页面文件, 解析项, page_parser 函数, BeautifulSoup 旧写法, lxml XPath, 期望结果)
+CASES = [
+    ('sign_page.html', 'formhash', page_parser.find_formhash, soup_formhash,
+     '//input[@name="formhash"]/@value', '0a1b2c3d'),
+    ('sign_page.html', 'space_username', page_parser.find_space_username, soup_space_username,
+     None, 'sscvex'),
+    ('sign_page_logged_out.html', 'space_username', page_parser.find_space_username, soup_space_username,
+     None, None),
+    ('login_page.html', 'formhash', page_parser.find_formhash, soup_formhash,
+     '//input[@name="formhash"]/@value', '0a1b2c3d'),
+    ('login_page.html', 'loginhash', page_parser.find_loginhash, soup_loginhash,
+     None, 'LsJ3A'),
+    ('login_page.html', 'verify_image_url', page_parser.find_verify_image_url, soup_verify_image_url,
+     '//img[@class="tsdm_verify"]/@src', 'plugin.php?id=oracle:verify&update=0.123'),
+]
+CASE_IDS = [f"{fixture}:{name}" for fixture, name, *_ in CASES]
+# (页面文件, 解析项, page_parser 函数, 期望结果)：只有正则写法的解析项，流式读取时据此判断能否提前结束
+PATTERN_CASES = [
+    ('sign_page.html', 'has_sign_form', page_parser.has_sign_form, True),
+    ('sign_page_signed.html', 'has_sign_form', page_parser.has_sign_form, False),
+    ('sign_page_logged_out.html', 'has_sign_form', page_parser.has_sign_form, False),
+    ('sign_page.html', 'has_space_link', page_parser.has_space_link, True),
+    ('sign_page_logged_out.html', 'has_space_link', page_parser.has_space_link, False),
+    ('work_page_wait.html', 'work_wait', page_parser.find_work_wait, timedelta(hours=5, minutes=59, seconds=50)),
+    ('sign_page.html', 'work_wait', page_parser.find_work_wait, None),
+    ('sign_response.xml', 'strip_tags', page_parser.strip_tags, '提示信息 恭喜你签到成功!获得随机奖励 天使币 9 .'),
+]
+PATTERN_CASE_IDS = [f"{fixture}:{name}" for fixture, name, *_ in PATTERN_CASES]
+XPATH_CASES = [case for case in CASES if case[4]]
+XPATH_CASE_IDS = [f"{fixture}:{name}" for fixture, name, *_ in XPATH_CASES]
+
+
+@pytest.mark.parametrize('case', CASES, ids=CASE_IDS)
+def test_page_parser(benchmark, read_fixture, case):
+    fixture, name, func, _, _, expected = case
+    benchmark.group = f"{fixture}:{name}"
+    text = read_fixture(fixture)
+    assert benchmark(func, text) == expected
+
+
+@pytest.mark.parametrize('case', PATTERN_CASES, ids=PATTERN_CASE_IDS)
+def test_page_parser_patterns(benchmark, read_fixture, case):
+    fixture, name, func, expected = case
+    benchmark.group = f"{fixture}:{name}"
+    text = read_fixture(fixture)
+    assert benchmark(func, text) == expected
+
+
+@pytest.mark.parametrize('case', CASES, ids=CASE_IDS)
+def test_bs4_baseline(benchmark, read_fixture, case):
+    fixture, name, _, soup_func, _, expected = case
+    benchmark.group = f"{fixture}:{name}"
+    text = read_fixture(fixture)
+    assert benchmark(soup_func, text) == expected
+
+
+@pytest.mark.skipif(page_parser.lxml_html is None, reason="未安装 lxml")
+@pytest.mark.parametrize('case', XPATH_CASES, ids=XPATH_CASE_IDS)
+def test_lxml_fallback(benchmark, read_fixture, case):
+    fixture, name, _, _, xpath, expected = case
+    benchmark.group = f"{fixture}:{name}"
+    text = read_fixture(fixture)
+    assert benchmark(page_parser._xpath_first, text, xpath) == expected
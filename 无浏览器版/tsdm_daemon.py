@@ -0,0 +1,171 @@
+"""
+无界面的签到/打工守护进程，不依赖 PyQt5，适合在 Linux 服务器上运行。
+
+用法:
+    python -m tsdm_daemon                 # 常驻运行，按调度时间自动签到、打工
+    python -m tsdm_daemon --once          # 处理当前所有到期账号后退出，可配合 cron 使用
+    python -m tsdm_daemon --config /path/to/login_info.json
+    python -m tsdm_daemon --sweep         # 并发检查所有账号的 cookie 是否有效后退出
+    python -m tsdm_daemon --metrics-port 9108  # 在 http://127.0.0.1:9108/metrics 提供耗时统计
+"""
+import sys
+import queue
+import signal
+import logging
+import argparse
+import threading
+import config_handler
+import metrics
+import cookie_sweep
+from log_config import setup_logger
+from account_store import account_store
+from scheduler import DeadlineScheduler
+from task_executor import TaskExecutor, MAX_WORKERS, MAX_PER_HOST
+from concurrency_controller import concurrency_controller
+from dispatch_policy import MAX_TASK_RATE, SIGN_JITTER, estimate_drain_seconds
+from async_engine import engine, run_batch, perform_sign_async, perform_work_async
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+MAX_SLEEP = 3600  # 单次睡眠最长秒数，防止系统休眠或改时间后错过截止时间
+
+
+def log_to_stdout():
+    """把控制台日志输出从 stderr 切换到 stdout"""
+    for handler in logger.handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setStream(sys.stdout)
+
+
+def run_once(concurrency, max_rate):
+    """处理所有当前到期的账号后返回，单次运行不分散签到时间，只按 max_rate 限速"""
+    scheduler = DeadlineScheduler()
+    scheduler.sync_accounts(account_store.all_accounts())
+    tasks = scheduler.pop_due()
+    if not tasks:
+        logger.info("没有到期的签到或打工任务")
+        return
+    logger.info(f"本次需要执行 {len(tasks)} 个任务，预计至少需要 {estimate_drain_seconds(len(tasks), max_rate):.0f} 秒")
+    engine.run_sync(run_batch(tasks, concurrency, max_rate))
+    account_store.flush()
+    logger.info("到期任务已全部处理完成")
+
+
+def run_forever(max_workers, max_per_host, max_rate, sign_jitter, stop_event, wake_event):
+    """常驻运行：睡眠到最早的截止时间，到点后把到期任务交给执行器"""
+    finished = queue.SimpleQueue()
+
+    def on_finished(task_type, username):
+        finished.put(username)
+        wake_event.set()
+
+    executor = TaskExecutor(
+        {'sign': perform_sign_async, 'work': perform_work_async},
+        max_workers=max_workers,
+        max_per_host=max_per_host,
+        on_finished=on_finished,
+        loop=engine.get_loop(),
+        max_rate=max_rate,
+        controller=concurrency_controller
+    )
+    scheduler = DeadlineScheduler(sign_jitter=sign_jitter)
+    scheduler.sync_accounts(account_store.all_accounts())
+    logger.info("守护进程已启动")
+
+    try:
+        while not stop_event.is_set():
+            # 任务结束后按账号的最新状态重新计算截止时间
+            while not finished.empty():
+                username = finished.get()
+                account_info = account_store.get(username)
+                if account_info is None:
+                    scheduler.remove_account(username)
+                else:
+                    scheduler.reschedule_account(username, account_info, retry=True)
+
+            due_tasks = scheduler.pop_due()
+            for task_type, username in due_tasks:
+                executor.submit(task_type, username)
+            if len(due_tasks) > 1:
+                logger.info(f"提交 {len(due_tasks)} 个到期任务，按限速预计 {executor.estimated_drain_seconds():.0f} 秒内全部开始执行")
+
+            wait_seconds = scheduler.seconds_until_next()
+            wait_seconds = MAX_SLEEP if wait_seconds is None else min(wait_seconds, MAX_SLEEP)
+            wake_event.wait(wait_seconds)
+            wake_event.clear()
+    finally:
+        executor.shutdown()
+        account_store.flush()
+        stats = executor.stats()
+        logger.info(f"守护进程已退出，完成 {stats['completed']} 个任务，出错 {stats['failed']} 个，"
+                    f"超时 {stats['timed_out']} 个（卡住损失 {stats['stalled_seconds']:.0f} 秒）")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='tsdm_daemon', description='天使动漫论坛无界面签到打工工具')
+    parser.add_argument('--once', action='store_true', help='处理所有到期账号后退出')
+    parser.add_argument('--config', help='账号配置文件路径，默认为程序目录下的 login_info.json')
+    parser.add_argument('--max-workers', type=int, help=f'同时执行的任务数，默认 {MAX_WORKERS}')
+    parser.add_argument('--max-per-host', type=int, help=f'同一主机同时执行的任务数上限，默认 {MAX_PER_HOST}')
+    parser.add_argument('--max-rate', type=float, help=f'同一主机每秒最多启动的任务数，0 表示不限速，默认 {MAX_TASK_RATE}')
+    parser.add_argument('--sign-jitter', type=float, help=f'把各账号的签到时间分散到 1 点后的多少秒内，默认 {SIGN_JITTER}')
+    parser.add_argument('--sweep', action='store_true', help='并发检查所有账号的 cookie 是否有效，写回结果后退出')
+    parser.add_argument('--sweep-concurrency', type=int,
+                        help=f'检查 cookie 时同时进行的检查数，默认 {cookie_sweep.SWEEP_CONCURRENCY}')
+    parser.add_argument('--sweep-rate', type=float,
+                        help=f'检查 cookie 时每秒最多发出的请求数，0 表示不限速，默认 {cookie_sweep.SWEEP_MAX_RATE}')
+    parser.add_argument('--force', action='store_true', help='与 --sweep 一起使用，忽略有效期缓存，检查所有账号')
+    parser.add_argument('--metrics-port', type=int, help='在本机该端口的 /metrics 提供 Prometheus 格式的耗时统计')
+    parser.add_argument('--metrics-file', help=f'每 {metrics.METRICS_FILE_INTERVAL} 秒把耗时统计写入该文件，退出时再写一次')
+    args = parser.parse_args(argv)
+
+    log_to_stdout()
+    if args.config:
+        config_handler.CONFIG_FILE = args.config
+    account_store.load()
+
+    max_workers = args.max_workers or account_store.get_setting("max_workers", MAX_WORKERS)
+    max_per_host = args.max_per_host or account_store.get_setting("max_per_host", MAX_PER_HOST)
+    max_rate = args.max_rate if args.max_rate is not None else account_store.get_setting("max_task_rate", MAX_TASK_RATE)
+    sign_jitter = args.sign_jitter if args.sign_jitter is not None else account_store.get_setting("sign_jitter", SIGN_JITTER)
+    metrics_port = args.metrics_port or account_store.get_setting("metrics_port")
+    metrics_file = args.metrics_file or account_store.get_setting("metrics_file")
+    if metrics_port:
+        metrics.start_http_server(metrics_port)
+
+    stop_event = threading.Event()
+    if args.sweep:
+        sweep_rate = args.sweep_rate if args.sweep_rate is not None else account_store.get_setting(
+            "sweep_max_rate", cookie_sweep.SWEEP_MAX_RATE)
+        sweep_concurrency = args.sweep_concurrency or account_store.get_setting(
+            "sweep_concurrency", cookie_sweep.SWEEP_CONCURRENCY)
+        summary = cookie_sweep.sweep(sweep_concurrency, sweep_rate, args.force)
+        if metrics_file:
+            metrics.write_file(metrics_file)
+        return 1 if summary['expired'] else 0
+
+    if args.once:
+        run_once(min(max_workers, max_per_host), max_rate)
+        if metrics_file:
+            metrics.write_file(metrics_file)
+        return 0
+
+    wake_event = threading.Event()
+    if metrics_file:
+        metrics.start_file_writer(metrics_file, stop_event=stop_event)
+
+    def handle_signal(signum, frame):
+        logger.info(f"收到信号 {signum}，正在退出")
+        stop_event.set()
+        wake_event.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+    run_forever(max_workers, max_per_host, max_rate, sign_jitter, stop_event, wake_event)
+    if metrics_file:
+        metrics.write_file(metrics_file)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
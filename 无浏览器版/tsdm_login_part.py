@@ -1,16 +1,22 @@
 import requests
-from bs4 import BeautifulSoup
-import time
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton
 from PyQt5.QtGui import QPixmap, QImage
-from PyQt5.QtCore import QByteArray, Qt
+from PyQt5.QtCore import QByteArray, Qt, pyqtSignal
 import sys
 from log_config import setup_logger
 from config_handler import update_account_info
+from cookie_jar import CookieJar
+from page_parser import find_formhash, find_loginhash, find_verify_image_url
+from session_manager import create_session, REQUEST_TIMEOUT
+import forum_site
 
 logger = setup_logger('tsdm_sign_tools.log')
 
+LOGIN_PATH = 'member.php?mod=logging&action=login'
+
 class LoginWindow(QWidget):
+    login_succeeded = pyqtSignal(str)  # 登录成功，参数为用户名
+
     def __init__(self, session, username=None, password=None):
         super().__init__()
         self.session = session
@@ -21,6 +27,11 @@ class LoginWindow(QWidget):
         self.error_label = None
         self.initUI()
 
+    def closeEvent(self, event):
+        # 签到打工走异步引擎的连接池，登录窗口关闭后会话不再使用，释放其中的连接
+        self.session.close()
+        super().closeEvent(event)
+
     def initUI(self):
         layout = QVBoxLayout()
         self.setLayout(layout)
@@ -63,35 +74,31 @@ class LoginWindow(QWidget):
         self.show()
 
     def update_verification_code(self):
-        login_url = 'https://www.tsdm39.com/member.php?mod=logging&action=login'
-        base_url = 'https://www.tsdm39.com/'
+        login_url = forum_site.url(LOGIN_PATH)
         headers1 = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36 Edg/135.0.0.0',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
             'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8,en-GB;q=0.7,en-US;q=0.6',
         }
         try:
-            response = self.session.get(login_url, headers=headers1)
+            response = self.session.get(login_url, headers=headers1, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            verify_img = soup.find('img', class_='tsdm_verify')
-            if verify_img:
-                verify_img_url = verify_img.get('src')
-                if verify_img_url:
-                    full_verify_img_url = base_url + verify_img_url if not verify_img_url.startswith('http') else verify_img_url
-                    img_response = self.session.get(full_verify_img_url, headers=headers1)
-                    img_response.raise_for_status()
-                    img_data = img_response.content
-                    qimage = QImage()
-                    qimage.loadFromData(QByteArray(img_data))
-                    pixmap = QPixmap.fromImage(qimage)
-                    if self.img_label is None:
-                        self.img_label = QLabel(self)
-                        self.img_label.setPixmap(pixmap)
-                        self.layout().insertWidget(0, self.img_label)
-                        self.img_label.mousePressEvent = self.on_img_click
-                    else:
-                        self.img_label.setPixmap(pixmap)
+            verify_img_url = find_verify_image_url(response.text)
+            if verify_img_url:
+                full_verify_img_url = forum_site.url(verify_img_url) if not verify_img_url.startswith('http') else verify_img_url
+                img_response = self.session.get(full_verify_img_url, headers=headers1, timeout=REQUEST_TIMEOUT)
+                img_response.raise_for_status()
+                img_data = img_response.content
+                qimage = QImage()
+                qimage.loadFromData(QByteArray(img_data))
+                pixmap = QPixmap.fromImage(qimage)
+                if self.img_label is None:
+                    self.img_label = QLabel(self)
+                    self.img_label.setPixmap(pixmap)
+                    self.layout().insertWidget(0, self.img_label)
+                    self.img_label.mousePressEvent = self.on_img_click
+                else:
+                    self.img_label.setPixmap(pixmap)
         except requests.RequestException as e:
             logger.error(f"请求出错: {e}")
 
@@ -100,8 +107,7 @@ class LoginWindow(QWidget):
             self.update_verification_code()
 
     def submit(self):
-        login_url = 'https://www.tsdm39.com/member.php?mod=logging&action=login'
-        base_url = 'https://www.tsdm39.com/'
+        login_url = forum_site.url(LOGIN_PATH)
         headers1 = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36 Edg/135.0.0.0',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
@@ -111,22 +117,14 @@ class LoginWindow(QWidget):
         self.password = self.password_input.text()
         self.verification_code = self.verification_input.text()
         try:
-            response = self.session.get(login_url, headers=headers1)
+            response = self.session.get(login_url, headers=headers1, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            formhash_input = soup.find('input', {'name': 'formhash'})
-            formhash = formhash_input.get('value') if formhash_input else ''
-            main_message_div = soup.find('div', id=lambda x: x and x.startswith('main_messaqge_'))
-            loginhash = main_message_div.get('id').split('main_messaqge_')[-1] if main_message_div else ''
-            a1cookies = self.session.cookies.get_dict()
-            if "s_gkr8_682f_lastact" in a1cookies:
-                current_timestamp = str(int(time.time()))
-                parts = a1cookies["s_gkr8_682f_lastact"].split("%09", 1)
-                if len(parts) > 1:
-                    new_lastact = current_timestamp + "%09" + parts[1]
-                    a1cookies["s_gkr8_682f_lastact"] = new_lastact
-            self.session.cookies.update(a1cookies)
-            new_cookie = "; ".join([f"{key}={value}" for key, value in a1cookies.items()])
+            formhash = find_formhash(response.text) or ''
+            loginhash = find_loginhash(response.text) or ''
+            # 登录请求前更新 s_gkr8_682f_lastact，会话中的 cookie 同步更新
+            jar = CookieJar.from_values(self.session.cookies.get_dict())
+            new_cookie = jar.touch_lastact()
+            self.session.cookies.update(jar.values())
             headers2 = {
                 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
                 'Accept-Encoding': 'gzip, deflate, br, zstd',
@@ -135,9 +133,9 @@ class LoginWindow(QWidget):
                 'Connection': 'keep-alive',
                 'Content-Type': 'application/x-www-form-urlencoded',
                 'Cookie': new_cookie,
-                'Host': 'www.tsdm39.com',
-                'Origin': 'https://www.tsdm39.com',
-                'Referer': 'https://www.tsdm39.com/member.php?mod=logging&action=login',
+                'Host': forum_site.netloc(),
+                'Origin': forum_site.base_url(),
+                'Referer': login_url,
                 'Sec-Fetch-Dest': 'document',
                 'Sec-Fetch-Mode': 'navigate',
                 'Sec-Fetch-Site': 'same-origin',
@@ -157,7 +155,7 @@ class LoginWindow(QWidget):
             }
             data = {
                 'formhash': formhash,
-                'referer': 'https://www.tsdm39.com/./',
+                'referer': forum_site.url('./'),
                 'loginfield': 'username',
                 'username': self.username,
                 'password': self.password,
@@ -166,10 +164,11 @@ class LoginWindow(QWidget):
                 'answer': '',
                 'loginsubmit': 'true'
             }
-            cur_login_url = f'{base_url}/member.php?mod=logging&action=login&loginsubmit=yes&loginhash={loginhash}'
-            login_response = self.session.post(cur_login_url, headers=headers2, params=params, data=data)
+            cur_login_url = forum_site.url(f'member.php?mod=logging&action=login&loginsubmit=yes&loginhash={loginhash}')
+            login_response = self.session.post(cur_login_url, headers=headers2, params=params, data=data,
+                                               timeout=REQUEST_TIMEOUT)
             login_response.raise_for_status()
-            logger.info("登录请求已发送，响应状态码:", login_response.status_code)
+            logger.info("登录请求已发送，响应状态码: %s", login_response.status_code)
 
             if "欢迎您回来" in login_response.text:
                 logger.info("登录成功！")
@@ -177,24 +176,17 @@ class LoginWindow(QWidget):
                 #     html_file.write(login_response.text)
                 # logger.info("登录后的页面 HTML 已保存到 page_after_login.html")
 
-                cookies_after_login = self.session.cookies.get_dict()
-                cookies_list = []
-                for key, value in cookies_after_login.items():
-                    cookies_list.append({
-                        "name": key,
-                        "value": value
-                    })
-
-                # 调用 config_handler 中的方法更新账户信息
+                # 调用 config_handler 中的方法更新账户信息，之后签到打工使用新的 cookie 罐
                 update_account_info(
                     username=self.username,
-                    cookies=cookies_list,
+                    cookies=CookieJar.from_values(self.session.cookies.get_dict()).to_list(),
                     is_valid=True,
                     last_sign_date="",
                     last_work_time=""
                 )
 
                 logger.info("登录信息已更新到配置文件")
+                self.login_succeeded.emit(self.username)
                 self.close()
             else:
                 logger.info("登录失败，请检查用户名、密码和验证码。")
@@ -206,7 +198,7 @@ class LoginWindow(QWidget):
 
 if __name__ == "__main__":
     try:
-        session = requests.Session()
+        session = create_session()
         app = QApplication(sys.argv)
         login_window = LoginWindow(session)  # 确保传入 session
         sys.exit(app.exec_())
@@ -107,7 +107,7 @@ def update_geckodriver():
     """更新 geckodriver 并更新配置文件"""
     try:
         # 获取 GitHub 上的最新版本
-        response = requests.get("https://api.github.com/repos/mozilla/geckodriver/releases/latest")
+        response = requests.get("https://api.github.com/repos/mozilla/geckodriver/releases/latest", timeout=(10, 20))
         response.raise_for_status()
         latest_version = response.json()["tag_name"].lstrip('v')
 
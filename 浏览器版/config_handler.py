@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import time
 import logging
 
 # 配置日志
@@ -18,6 +19,9 @@ else:
 # 构建配置文件的完整路径
 CONFIG_FILE = os.path.join(base_path, 'config.json')
 
+# cookie 确认有效后多少秒内不再重新检查，可以在配置文件中用 validity_ttl 修改，0 表示不缓存
+DEFAULT_VALIDITY_TTL = 3600
+
 def load_config():
     """
     加载配置文件，若文件不存在，返回默认配置。
@@ -89,4 +93,39 @@ def update_account_info(username, cookies, is_valid=True, last_sign_date="", las
         "last_work_time": last_work_time
     }
     config["account_categories"] = account_categories
-    save_config(config)
\ No newline at end of file
+    save_config(config)
+
+def _within_validity_ttl(config, account_info):
+    ttl = config.get("validity_ttl", DEFAULT_VALIDITY_TTL)
+    if ttl <= 0 or not account_info or not account_info.get("is_cookie_valid", False):
+        return False
+    return time.time() - account_info.get("last_valid_time", 0) < ttl
+
+def is_cookie_recently_valid(username):
+    """
+    账号的 cookie 是否在有效期内确认过有效。
+    """
+    config = load_config()
+    return _within_validity_ttl(config, config["account_categories"].get(username))
+
+def mark_cookie_valid(username):
+    """
+    记录账号的 cookie 刚刚确认有效。上次确认仍在有效期内时不重写配置文件。
+    """
+    config = load_config()
+    account_info = config["account_categories"].get(username)
+    if account_info is None or _within_validity_ttl(config, account_info):
+        return
+    account_info["is_cookie_valid"] = True
+    account_info["last_valid_time"] = time.time()
+    save_config(config)
+
+def invalidate_cookie(username):
+    """
+    标记账号的 cookie 已失效并清除有效期缓存。
+    """
+    config = load_config()
+    if username in config["account_categories"]:
+        config["account_categories"][username]["is_cookie_valid"] = False
+        config["account_categories"][username].pop("last_valid_time", None)
+        save_config(config)
@@ -0,0 +1,43 @@
+"""
+论坛页面解析：签到前用 requests 检查 cookie 时，从页面中读取当前登录的用户名。
+正则未命中时，若安装了 lxml 则用 XPath 再查找一次，兼容属性顺序等写法变化。
+"""
+import re
+import html
+from log_config import setup_logger
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    etree = lxml_html = None
+
+logger = setup_logger('tsdm_sign_tools.log')
+
+SPACE_LINK_PATTERN = re.compile(r'<a\b[^>]*\btitle="访问我的空间"[^>]*>(.*?)</a>', re.S)
+TAG_PATTERN = re.compile(r'<!\[CDATA\[|\]\]>|<[^>]+>')
+
+
+def _xpath_first(text, xpath):
+    """正则未命中时的后备查找，未安装 lxml 或页面无法解析时返回 None"""
+    if lxml_html is None or not text:
+        return None
+    try:
+        result = lxml_html.fromstring(text).xpath(xpath)
+    except (ValueError, etree.ParserError) as e:
+        logger.error(f"解析页面出错: {e}")
+        return None
+    return result[0] if result else None
+
+
+def strip_tags(text):
+    """去掉标签和 CDATA 标记，合并空白"""
+    return ' '.join(TAG_PATTERN.sub(' ', text).split())
+
+
+def find_space_username(text):
+    """从“访问我的空间”链接中读取当前登录的用户名，未登录时返回 None"""
+    match = SPACE_LINK_PATTERN.search(text)
+    if match:
+        return html.unescape(strip_tags(match.group(1)))
+    link = _xpath_first(text, '//a[@title="访问我的空间"]')
+    return link.text_content().strip() if link is not None else None
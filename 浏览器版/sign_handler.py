@@ -2,12 +2,12 @@ import random
 from datetime import datetime
 from log_config import setup_logger
 from selenium.webdriver.common.by import By
-from config_handler import load_config, save_config
+from config_handler import load_config, save_config, is_cookie_recently_valid, mark_cookie_valid, invalidate_cookie
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from browser_manager import get_browser_driver, check_driver_validity
 import requests
-from bs4 import BeautifulSoup
+from page_parser import find_space_username
 
 # 配置日志
 logger = setup_logger('tsdm_sign_tools.log')
@@ -24,6 +24,7 @@ sign_cookie_wrong = "您需要先登录才能继续本操作"
 signed = "您今天已经签到过了或者签到时间还未开始"
 
 SIGN_URL = 'https://www.tsdm39.com/plugin.php?id=dsu_paulsign:sign'
+REQUEST_TIMEOUT = (10, 20)  # (连接超时, 读取超时) 秒数
 
 
 def ensure_browser_started():
@@ -31,29 +32,29 @@ def ensure_browser_started():
     return driver
 
 def check_cookie_validity(driver, username, cookies):
+    # 有效期内确认过有效的 cookie 不再重新加载签到页面检查
+    if is_cookie_recently_valid(username):
+        logger.info(f"{username} 的 cookie 在有效期缓存内，跳过检查")
+        return True
     logger.info("准备使用 requests 检查 cookie 有效性")
     try:
         # 使用 requests 发送请求并附带 cookies
-        response = requests.get(SIGN_URL, cookies=cookies)
+        response = requests.get(SIGN_URL, cookies=cookies, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         
-        # 使用 BeautifulSoup 解析 HTML 数据
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 查找访问我的空间链接元素
-        space_link_element = soup.find('a', {'title': '访问我的空间'})
-        if space_link_element:
-            actual_username = space_link_element.get_text().strip()
-            if actual_username == username:
-                return True
+        # 从访问我的空间链接中读取当前登录的用户名
+        actual_username = find_space_username(response.text)
+        if actual_username == username:
+            mark_cookie_valid(username)
+            return True
+        if sign_cookie_wrong in response.text:
+            # 页面提示需要登录，清除有效期缓存
+            invalidate_cookie(username)
     except Exception as e:
         logger.error(f"检查 {username} 的 cookie 有效性时出错: {e}")
         
         # 标记 cookie 无效
-        config = load_config()
-        if username in config.get('account_categories', {}):
-            config['account_categories'][username]["is_cookie_valid"] = False
-            save_config(config)
+        invalidate_cookie(username)
     
     return False
 
@@ -72,6 +73,11 @@ def perform_sign(username, cookies):
 
     # 跳转到签到页面
     driver.get(SIGN_URL)
+    if sign_cookie_wrong in driver.page_source:
+        # 有效期缓存内的 cookie 也可能已经失效，页面提示需要登录时立即标记
+        logger.error(f"{username} 的 cookie 已失效，签到操作终止")
+        invalidate_cookie(username)
+        return
 
     try:
         # 显式等待检查是否已经签到的元素加载完成
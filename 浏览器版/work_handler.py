@@ -3,7 +3,7 @@ import random
 from log_config import setup_logger
 from datetime import datetime, timedelta
 from selenium.webdriver.common.by import By
-from config_handler import load_config, save_config
+from config_handler import load_config, save_config, mark_cookie_valid, invalidate_cookie
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from browser_manager import get_browser_driver, check_driver_validity
@@ -53,15 +53,13 @@ def check_cookie_validity(driver, username, cookies):
         )
         actual_username = space_link_element.text.strip()
         if actual_username == username:
+            mark_cookie_valid(username)
             return True
     except Exception as e:
         logger.error(f"检查 {username} 的 cookie 有效性时出错: {e}")
 
     # 标记 cookie 无效
-    config = load_config()
-    if username in config.get('account_categories', {}):
-        config['account_categories'][username]["is_cookie_valid"] = False
-        save_config(config)
+    invalidate_cookie(username)
     return False
 
 def calculate_work_time(driver):